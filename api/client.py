@@ -17,7 +17,9 @@ class APIClient:
         self.token = Settings.API_TOKEN
         # 如果启用了代理，配置代理
         from utils.proxy import get_proxy_config
-        self.proxies = get_proxy_config()
+        # requests 会向 proxies 写入环境变量中的代理，因此持有一份私有副本
+        proxies = get_proxy_config()
+        self.proxies = dict(proxies) if proxies else None
         if self.proxies:
             logger.info("✅ API客户端已配置代理")
     
@@ -103,11 +103,11 @@ class SubmissionHandler:
             
             # 更新工作流的群组消息ID（SQLite 使用 group_messages 字典）- 在线程池中执行
             if group_messages:
-                # 更新工作流的 group_messages（包含所有群组的消息ID）
+                # 记录各群组消息ID（消息映射表 + group_messages 在同一事务中写入）
                 await asyncio.to_thread(
-                    WorkflowManager.update_workflow,
+                    WorkflowManager.record_workflow_messages,
                     workflow_id,
-                    group_messages=group_messages,
+                    group_messages.items(),
                 )
                 logger.info(f"✅ 工作流 {workflow_id} 已发送到 {len(group_messages)} 个群组")
             else:
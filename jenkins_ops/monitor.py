@@ -1,11 +1,11 @@
 """Jenkins 构建状态监控模块"""
 import asyncio
-import json
 import time
 from typing import Dict, Optional
 from jenkins_ops.client import JenkinsClient
 from jenkins_ops.notifier import JenkinsNotifier
 from workflows.models import WorkflowManager
+from utils import json_fast
 from utils.logger import setup_logger
 
 logger = setup_logger(__name__)
@@ -209,8 +209,8 @@ class JenkinsMonitor:
                                 build_params = build_record.get('build_parameters')
                                 if isinstance(build_params, str):
                                     try:
-                                        build_params = json.loads(build_params)
-                                    except:
+                                        build_params = json_fast.loads(build_params)
+                                    except json_fast.DECODE_ERRORS:
                                         pass
                                 if isinstance(build_params, dict):
                                     git_hash = build_params.get('check_commitID')
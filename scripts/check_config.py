@@ -16,9 +16,9 @@ def main():
     print("检查数据库中的项目配置")
     print("=" * 50)
     
-    # 初始化数据库连接
     try:
-        conn = WorkflowManager._get_connection()
+        # 获取当前线程的只读连接（长生命周期，脚本内所有查询复用）
+        conn = WorkflowManager._thread_read_conn()
         cursor = conn.cursor()
         
         # 先检查表是否存在
@@ -26,7 +26,9 @@ class SSOClient:
         
         # 初始化代理配置（如果提供了项目名称，使用项目配置；否则使用全局配置）
         from utils.proxy import get_proxy_config
-        self.proxies = get_proxy_config(project_name)
+        # requests 会向 proxies 写入环境变量中的代理，因此持有一份私有副本
+        proxies = get_proxy_config(project_name)
+        self.proxies = dict(proxies) if proxies else None
     
     def get_job_ids(
         self,
@@ -7,6 +7,7 @@ from .proxy import (
     get_proxy_url,
     get_proxy_for_httpx,
     is_proxy_enabled,
+    normalize_proxy_type,
 )
 
 __all__ = [
@@ -19,5 +20,6 @@ __all__ = [
     'get_proxy_url',
     'get_proxy_for_httpx',
     'is_proxy_enabled',
+    'normalize_proxy_type',
 ]
 
@@ -11,6 +11,7 @@ from config.constants import (
     WORKFLOW_APPROVED_TEMPLATE_ADDRESS,
     WORKFLOW_REJECTED_TEMPLATE_ADDRESS,
 )
+from utils import json_fast
 
 
 def _resolve_template(template_key: str, default_template: str, project: str = None) -> str:
@@ -141,8 +142,7 @@ def format_submission_data(data: str) -> str:
     
     # 如果是JSON字符串，尝试格式化
     try:
-        import json
-        parsed = json.loads(data)
+        parsed = json_fast.loads(data)
         if isinstance(parsed, dict):
             formatted = []
             for key, value in parsed.items():
@@ -1,20 +1,21 @@
 """辅助函数"""
 from datetime import datetime
-from typing import Tuple
+from typing import Optional, Tuple
 from telegram import Update
-import uuid
+import secrets
 
 
 def generate_workflow_id() -> str:
     """生成工作流ID"""
     timestamp = datetime.now().strftime("%Y%m%d")
-    unique_id = str(uuid.uuid4())[:8].upper()
+    unique_id = secrets.token_hex(4).upper()
     return f"WF-{timestamp}-{unique_id}"
 
 
-def get_current_timestamp() -> str:
-    """获取当前时间戳（ISO格式）"""
-    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+def get_current_timestamp(epoch: Optional[float] = None) -> str:
+    """获取当前时间戳（ISO格式），传入 epoch 秒数时格式化该时刻（与整数时间戳共用一次取时）"""
+    now = datetime.now() if epoch is None else datetime.fromtimestamp(epoch)
+    return now.strftime("%Y-%m-%d %H:%M:%S")
 
 
 def get_user_info(update: Update) -> Tuple[int, str]:
@@ -0,0 +1,50 @@
+"""JSON 序列化工具模块（优先使用 orjson，未安装时解析回退到 ujson，最后回退到标准库 json）"""
+import json
+from typing import Any
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson 为可选加速依赖
+    orjson = None
+
+try:
+    import ujson
+except ImportError:  # pragma: no cover - ujson 仅作为未安装 orjson 时的解析回退
+    ujson = None
+
+# 解析失败时各实现抛出的异常（orjson/ujson/json 的解码异常都是 ValueError 的子类；
+# 非法输入类型时可能抛出 TypeError），调用方统一捕获此元组即可
+DECODE_ERRORS = (ValueError, TypeError)
+
+# 允许非字符串键（如 group_messages 的 int 群组ID），与标准库行为一致地转换为字符串
+_ORJSON_DUMPS_OPTIONS = orjson.OPT_NON_STR_KEYS if orjson else 0
+
+# 标准库回退时去掉分隔符后的空格，存储体积与 orjson 输出一致
+_COMPACT_SEPARATORS = (",", ":")
+
+
+def dumps(obj: Any) -> str:
+    """
+    序列化为紧凑 JSON 字符串（UTF-8 原样输出，无多余空白，与 orjson 输出格式一致）
+
+    orjson 不支持的对象（如超出 64 位的整数）回退到标准库处理。
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, option=_ORJSON_DUMPS_OPTIONS).decode("utf-8")
+        except TypeError:
+            pass
+    return json.dumps(obj, ensure_ascii=False, separators=_COMPACT_SEPARATORS)
+
+
+def _select_loads():
+    """选择可用的最快解析实现（模块加载时确定一次）"""
+    if orjson is not None:
+        return orjson.loads
+    if ujson is not None:
+        return ujson.loads
+    return json.loads
+
+
+# 反序列化 JSON（接受 str/bytes），解析失败抛出 DECODE_ERRORS 中的异常
+loads = _select_loads()
@@ -1,10 +1,26 @@
 """代理配置工具模块"""
-from typing import Optional, Dict
+from types import MappingProxyType
+from typing import Optional, Dict, Mapping
 from urllib.parse import quote
 from utils.logger import setup_logger
 
 logger = setup_logger(__name__)
 
+# 支持的代理类型
+_VALID_PROXY_TYPES = frozenset({'socks5', 'socks5h', 'http', 'https'})
+
+# 未计算标记（区别于"已计算但未启用代理"的 None）
+_SENTINEL = object()
+
+# 全局代理 URL（Telegram Bot 等 project_name=None 的热路径），配置变更时重置为 _SENTINEL
+_GLOBAL_PROXY_URL = _SENTINEL
+
+# 项目级代理 URL 缓存：project_name -> proxy_url（None 表示未启用），配置变更时清空
+_PROJECT_PROXY_URLS: Dict[str, Optional[str]] = {}
+
+# requests 代理字典的只读共享视图：proxy_url -> {"http": url, "https": url}，配置变更时清空
+_PROXIES_VIEWS: Dict[str, Mapping[str, str]] = {}
+
 
 def _load_proxy_settings(project_name: Optional[str] = None) -> Optional[Dict[str, str]]:
     """加载代理配置（项目级或全局），未启用则返回 None。"""
@@ -21,7 +37,7 @@ def _load_proxy_settings(project_name: Optional[str] = None) -> Optional[Dict[st
             "port": proxy_config.get('port', 0),
             "username": proxy_config.get('username', ''),
             "password": proxy_config.get('password', ''),
-            "proxy_type": proxy_config.get('type', 'socks5'),
+            "proxy_type": proxy_config.get('type') or 'socks5h',
             "project_name": project_name,
         }
 
@@ -29,42 +45,36 @@ def _load_proxy_settings(project_name: Optional[str] = None) -> Optional[Dict[st
     if not proxy_enabled or proxy_enabled.lower() != "true":
         return None
 
-    proxy_host = WorkflowManager.get_app_config("PROXY_HOST", "")
-    proxy_port_str = WorkflowManager.get_app_config("PROXY_PORT", "")
-    try:
-        proxy_port = int(proxy_port_str) if proxy_port_str else 0
-    except ValueError:
-        proxy_port = 0
-
     return {
-        "host": proxy_host,
-        "port": proxy_port,
+        "host": WorkflowManager.get_app_config("PROXY_HOST", ""),
+        "port": WorkflowManager.get_app_config_int("PROXY_PORT", 0),
         "username": WorkflowManager.get_app_config("PROXY_USERNAME", ""),
         "password": WorkflowManager.get_app_config("PROXY_PASSWORD", ""),
-        "proxy_type": WorkflowManager.get_app_config("PROXY_TYPE", "socks5"),
+        "proxy_type": WorkflowManager.get_app_config("PROXY_TYPE", "") or "socks5h",
         "project_name": None,
     }
 
 
-def _normalize_proxy_type(proxy_type: str) -> str:
-    """规范化代理类型，兼容 socks5 -> socks5h，并过滤非法值。"""
-    proxy_type = (proxy_type or 'socks5').lower()
-    allowed = ['socks5', 'socks5h', 'http', 'https']
-    if proxy_type not in allowed:
+def normalize_proxy_type(proxy_type: Optional[str]) -> str:
+    """
+    规范化代理类型（在配置写入时调用一次，读取路径直接使用规范值）
+
+    兼容 socks5 -> socks5h（DNS 解析通过代理服务器），非法值回退为 socks5h。
+    """
+    proxy_type = (proxy_type or 'socks5h').strip().lower()
+    if proxy_type not in _VALID_PROXY_TYPES:
         logger.warning(f"⚠️ 不支持的代理类型: {proxy_type}，使用默认值 socks5h")
-        proxy_type = 'socks5h'
+        return 'socks5h'
     if proxy_type == 'socks5':
-        proxy_type = 'socks5h'
-        logger.debug("将 socks5 转换为 socks5h（DNS 解析通过代理服务器）")
+        return 'socks5h'
     return proxy_type
 
 
 def _build_proxy_url(host: str, port: int, username: str, password: str, proxy_type: str) -> Optional[str]:
-    """根据配置构建代理 URL，缺失 host/port 时返回 None。"""
+    """根据配置构建代理 URL，缺失 host/port 时返回 None（proxy_type 需已规范化）。"""
     if not host or not port:
         return None
 
-    proxy_type = _normalize_proxy_type(proxy_type)
     if username and password:
         user = quote(username, safe='')
         pwd = quote(password, safe='')
@@ -72,7 +82,57 @@ def _build_proxy_url(host: str, port: int, username: str, password: str, proxy_t
     return f"{proxy_type}://{host}:{port}"
 
 
-def get_proxy_config(project_name: Optional[str] = None) -> Optional[Dict[str, str]]:
+def _reset_proxy_cache():
+    """配置变更回调：重置全局代理并清空项目级代理缓存。"""
+    global _GLOBAL_PROXY_URL
+    _GLOBAL_PROXY_URL = _SENTINEL
+    _PROJECT_PROXY_URLS.clear()
+    _PROXIES_VIEWS.clear()
+
+
+def _compute_proxy_url(project_name: Optional[str] = None) -> Optional[str]:
+    """从数据库配置计算代理 URL（仅在缓存未命中时调用）。"""
+    from workflows.models import WorkflowManager  # 延迟导入，避免循环
+
+    # 先注册监听器再读取配置，保证读取期间发生的配置变更也能使缓存失效
+    WorkflowManager.register_config_listener(_reset_proxy_cache)
+
+    settings = _load_proxy_settings(project_name)
+    if not settings:
+        return None
+
+    # 数据库中的历史数据（初始化脚本、手工修改、旧版本写入）可能未经规范化，
+    # 在缓存未命中的冷路径上统一规范化一次
+    proxy_url = _build_proxy_url(
+        settings["host"],
+        settings["port"],
+        settings["username"],
+        settings["password"],
+        normalize_proxy_type(settings["proxy_type"]),
+    )
+    if proxy_url:
+        logger.debug(f"代理 URL 已解析: {proxy_url} (项目: {project_name or '全局'})")
+    return proxy_url
+
+
+def _resolve_proxy_url(project_name: Optional[str] = None) -> Optional[str]:
+    """获取代理 URL（带缓存），全局配置走独立的模块级槽位。"""
+    global _GLOBAL_PROXY_URL
+
+    if not project_name:
+        proxy_url = _GLOBAL_PROXY_URL
+        if proxy_url is _SENTINEL:
+            proxy_url = _GLOBAL_PROXY_URL = _compute_proxy_url(None)
+        return proxy_url
+
+    try:
+        return _PROJECT_PROXY_URLS[project_name]
+    except KeyError:
+        proxy_url = _PROJECT_PROXY_URLS[project_name] = _compute_proxy_url(project_name)
+        return proxy_url
+
+
+def get_proxy_config(project_name: Optional[str] = None) -> Optional[Mapping[str, str]]:
     """
     获取代理配置（用于 requests 库）
     
@@ -87,28 +147,18 @@ def get_proxy_config(project_name: Optional[str] = None) -> Optional[Dict[str, s
         project_name: 项目名称（可选），如果提供则从项目配置读取，否则从全局配置读取
     
     Returns:
-        代理字典，格式为 {"http": "proxy_url", "https": "proxy_url"}
+        只读代理映射（共享缓存，调用方需要修改时请自行 dict() 复制），
+        格式为 {"http": "proxy_url", "https": "proxy_url"}
         同时包含HTTP和HTTPS的代理配置，确保两种协议都能正常工作
         如果未启用代理或配置不完整，返回 None
     """
-    settings = _load_proxy_settings(project_name)
-    if not settings:
-        return None
-
-    proxy_url = _build_proxy_url(
-        settings["host"],
-        settings["port"],
-        settings["username"],
-        settings["password"],
-        settings["proxy_type"],
-    )
+    proxy_url = _resolve_proxy_url(project_name)
     if not proxy_url:
         return None
 
-    proxies = {"http": proxy_url, "https": proxy_url}
-    logger.debug(
-        f"代理配置已获取: {proxy_url} (项目: {project_name or '全局'})，同时支持HTTP和HTTPS"
-    )
+    proxies = _PROXIES_VIEWS.get(proxy_url)
+    if proxies is None:
+        proxies = _PROXIES_VIEWS[proxy_url] = MappingProxyType({"http": proxy_url, "https": proxy_url})
     return proxies
 
 
@@ -133,20 +183,7 @@ def get_proxy_url(project_name: Optional[str] = None) -> Optional[str]:
         代理 URL 字符串，格式为 "socks5://proxy_host:proxy_port" 或 "http://proxy_host:proxy_port"
         如果未启用代理或配置不完整，返回 None
     """
-    settings = _load_proxy_settings(project_name)
-    if not settings:
-        return None
-
-    proxy_url = _build_proxy_url(
-        settings["host"],
-        settings["port"],
-        settings["username"],
-        settings["password"],
-        settings["proxy_type"],
-    )
-    if proxy_url:
-        logger.debug(f"代理 URL 已获取: {proxy_url} (项目: {project_name or '全局'})")
-    return proxy_url
+    return _resolve_proxy_url(project_name)
 
 
 def get_proxy_for_httpx(project_name: Optional[str] = None):
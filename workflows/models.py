@@ -1,18 +1,524 @@
 """工作流数据模型"""
-import json
+import atexit
+import functools
+import secrets
 import sqlite3
+import threading
 import time
-import uuid
 from contextlib import contextmanager
 from pathlib import Path
-from typing import Dict, Optional, List
-from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, Optional, List, Tuple, Union
+from utils import json_fast
 from utils.helpers import generate_workflow_id, get_current_timestamp
-from config.constants import STATUS_PENDING
+from utils.proxy import normalize_proxy_type
+from config.constants import (
+    STATUS_PENDING,
+    WORKFLOW_MESSAGE_TEMPLATE,
+    WORKFLOW_APPROVED_TEMPLATE,
+    WORKFLOW_REJECTED_TEMPLATE,
+    WORKFLOW_MESSAGE_TEMPLATE_ADDRESS,
+    WORKFLOW_APPROVED_TEMPLATE_ADDRESS,
+    WORKFLOW_REJECTED_TEMPLATE_ADDRESS,
+)
 from utils.logger import setup_logger
 
 logger = setup_logger(__name__)
 
+# 每个连接的预编译语句缓存条目数（sqlite3 默认 128，按 SQL 文本精确匹配复用；
+# 动态 UPDATE 按字段组合各占一条，留足余量避免热点语句被挤出）
+STATEMENT_CACHE_SIZE = 512
+
+# 每个连接的页缓存上限（KiB，对应 PRAGMA cache_size 的负值；按需分配，不会预先占用）
+PAGE_CACHE_KIB = 65536
+
+# workflows 查询的固定列顺序（显式列出，_row_to_dict 按位置取值，不依赖表的物理列顺序）
+_WORKFLOW_COLUMNS = (
+    'workflow_id', 'timestamp', 'user_id', 'username', 'submission_data',
+    'status', 'approver_id', 'approver_username', 'approval_time',
+    'approval_comment', 'created_at', 'synced_to_api', 'group_messages',
+    'project', 'template_type',
+)
+_WF_GROUP_MESSAGES_IDX = _WORKFLOW_COLUMNS.index('group_messages')
+# template_type 的默认值在 SQL 中补齐（SQLite C 层完成），行转换时无需逐行判断
+_WORKFLOW_SELECT = ", ".join(
+    "COALESCE(NULLIF(template_type, ''), 'default') AS template_type" if column == 'template_type' else column
+    for column in _WORKFLOW_COLUMNS
+)
+
+# 热路径 SQL 使用模块级常量，保证文本完全一致以命中语句缓存
+_SQL_GET_WORKFLOW = f"SELECT {_WORKFLOW_SELECT} FROM workflows WHERE workflow_id = ?"
+_SQL_GET_WORKFLOW_ID_BY_MESSAGE_ID = "SELECT workflow_id FROM workflow_messages WHERE group_id = ? AND message_id = ?"
+_SQL_INSERT_SSO_BUILD_STATUS = """
+    INSERT INTO sso_build_status (
+        build_id, submission_id, workflow_id, release_id,
+        job_name, service_name, job_id, build_status,
+        build_start_time, created_at, updated_at
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+# 提交响应/错误信息为空时保留原值（固定 SQL 文本，各种参数组合共用一条缓存语句）
+_SQL_UPDATE_SSO_SUBMISSION_STATUS = """
+    UPDATE sso_submissions
+    SET submit_status = ?,
+        updated_at = ?,
+        submit_response = COALESCE(?, submit_response),
+        error_message = COALESCE(?, error_message)
+    WHERE submission_id = ?
+"""
+# 构建完成时记录结束时间；build_detail 为空时保留原值；job_name 从详情 JSON 的 jobName 提取
+# （详情不是合法 JSON 时保留原 job_name，json_extract 对非法 JSON 会报错）
+_SQL_UPDATE_SSO_BUILD_STATUS = """
+    UPDATE sso_build_status
+    SET build_status = :status,
+        updated_at = :updated_at,
+        build_end_time = CASE WHEN :status IN ('SUCCESS', 'FAILURE', 'ABORTED')
+                              THEN :end_time ELSE build_end_time END,
+        build_detail = COALESCE(:build_detail, build_detail),
+        job_name = COALESCE(
+            CASE WHEN json_valid(:build_detail) THEN json_extract(:build_detail, '$.jobName') END,
+            job_name
+        )
+    WHERE build_id = :build_id
+"""
+# sso_build_status 查询的固定列顺序（与 BuildRow 构造参数顺序一致）
+_SSO_BUILD_COLUMNS = (
+    'build_id', 'submission_id', 'workflow_id', 'release_id', 'job_name',
+    'service_name', 'job_id', 'build_status', 'build_start_time',
+    'build_end_time', 'build_detail', 'notified', 'notification_time',
+    'created_at', 'updated_at',
+)
+_SSO_BUILD_DETAIL_IDX = _SSO_BUILD_COLUMNS.index('build_detail')
+# sso_submissions / jenkins_builds 查询的显式列清单（不依赖 SELECT * 与表中列的物理顺序）
+_SSO_SUBMISSION_SELECT = ", ".join((
+    'submission_id', 'workflow_id', 'process_instance_id', 'sso_order_data',
+    'submit_status', 'submit_time', 'submit_response', 'error_message',
+    'created_at', 'updated_at',
+))
+_JENKINS_BUILD_COLUMNS = (
+    'build_id', 'workflow_id', 'job_name', 'job_url', 'build_number',
+    'build_status', 'build_start_time', 'build_end_time', 'build_duration',
+    'build_console_output', 'build_parameters', 'notified', 'notification_time',
+    'created_at', 'updated_at',
+)
+_JENKINS_BUILD_SELECT = ", ".join(_JENKINS_BUILD_COLUMNS)
+# 通知轮询不读取控制台输出（可能很大的 TEXT，存放在溢出页中），需要时按构建ID单独查询
+_JENKINS_PENDING_SELECT = ", ".join(
+    column for column in _JENKINS_BUILD_COLUMNS if column != 'build_console_output'
+)
+
+# 批量标记构建已通知（并从通知队列出队）：构建ID列表以 JSON 数组绑定，json_each 展开后一条语句完成
+_MARK_NOTIFIED_SQL = """
+    UPDATE sso_build_status SET notified = 1, notification_time = ?, updated_at = ?
+    WHERE build_id IN (SELECT value FROM json_each(?))
+"""
+_DEQUEUE_NOTIFICATION_SQL = "DELETE FROM sso_notification_queue WHERE build_id IN (SELECT value FROM json_each(?))"
+_MARK_JENKINS_NOTIFIED_SQL = """
+    UPDATE jenkins_builds SET notified = 1, notification_time = ?, updated_at = ?
+    WHERE build_id IN (SELECT value FROM json_each(?))
+"""
+# 消息模板：项目级与通用模板一次查询，项目级优先（project IS NULL 排在后面），空内容视为未配置
+_SQL_GET_MESSAGE_TEMPLATE = """
+    SELECT content FROM message_templates
+    WHERE template_type = ? AND (project = ? OR project IS NULL)
+      AND content IS NOT NULL AND content != ''
+    ORDER BY project IS NULL
+    LIMIT 1
+"""
+_SQL_GET_APP_CONFIG = "SELECT config_value FROM app_config WHERE config_key = ?"
+# 配置快照（两张配置表都只有少量行）：缓存到期时与上次快照比较，判断数据库中的配置是否被修改
+_SQL_CONFIG_SNAPSHOT = """
+    SELECT 'app', config_key, config_value FROM app_config
+    UNION ALL
+    SELECT 'project', config_key, config_value FROM project_options
+    ORDER BY 1, 2
+"""
+# 配置/消息映射写入使用 UPSERT（原地更新），不像 INSERT OR REPLACE 那样先删除旧行再插入
+_SQL_UPSERT_APP_CONFIG = """
+    INSERT INTO app_config (config_key, config_value, updated_at) VALUES (?, ?, ?)
+    ON CONFLICT(config_key) DO UPDATE SET
+        config_value = excluded.config_value,
+        updated_at = excluded.updated_at
+"""
+_SQL_UPSERT_PROJECT_OPTIONS = """
+    INSERT INTO project_options (config_key, config_value, updated_at) VALUES (?, ?, ?)
+    ON CONFLICT(config_key) DO UPDATE SET
+        config_value = excluded.config_value,
+        updated_at = excluded.updated_at
+"""
+_SQL_UPSERT_WORKFLOW_MESSAGE = """
+    INSERT INTO workflow_messages (group_id, message_id, workflow_id) VALUES (?, ?, ?)
+    ON CONFLICT(group_id, message_id) DO UPDATE SET
+        workflow_id = excluded.workflow_id
+"""
+# 在 SQL 中用 json_patch 原地合并群组消息ID，避免读-改-写的并发丢失更新
+_SQL_MERGE_GROUP_MESSAGES = """
+    UPDATE workflows SET group_messages = json_patch(COALESCE(group_messages, '{}'), ?)
+    WHERE workflow_id = ?
+"""
+_SQL_INSERT_WORKFLOW = """
+    INSERT INTO workflows (
+        workflow_id, timestamp, user_id, username, submission_data,
+        status, created_at, project, template_type
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+# SQLite 3.35+ 支持 RETURNING：插入与读回存储后的行（含列默认值）一次完成
+_RETURNING_SUPPORTED = sqlite3.sqlite_version_info >= (3, 35, 0)
+_SQL_INSERT_WORKFLOW_RETURNING = f"{_SQL_INSERT_WORKFLOW.rstrip()} RETURNING {_WORKFLOW_SELECT}"
+
+# 内置默认模板 (template_type, project, content)，启动时缺失则写入
+_DEFAULT_TEMPLATES = (
+    ("default", None, WORKFLOW_MESSAGE_TEMPLATE),
+    ("approved_default", None, WORKFLOW_APPROVED_TEMPLATE),
+    ("rejected_default", None, WORKFLOW_REJECTED_TEMPLATE),
+    ("address_only", None, WORKFLOW_MESSAGE_TEMPLATE_ADDRESS),
+    ("approved_address_only", None, WORKFLOW_APPROVED_TEMPLATE_ADDRESS),
+    ("rejected_address_only", None, WORKFLOW_REJECTED_TEMPLATE_ADDRESS),
+)
+
+# update_workflow / update_jenkins_build 允许更新的字段白名单
+_WORKFLOW_UPDATE_FIELDS = frozenset({
+    'user_id', 'username', 'submission_data', 'status',
+    'approver_id', 'approver_username', 'approval_time',
+    'approval_comment', 'synced_to_api', 'group_messages',
+    'project', 'template_type',
+})
+_JENKINS_BUILD_UPDATE_FIELDS = frozenset({
+    'job_name', 'job_url', 'build_number', 'build_status',
+    'build_start_time', 'build_end_time', 'build_duration',
+    'build_console_output', 'build_parameters', 'build_result',
+})
+
+
+@functools.lru_cache(maxsize=128)
+def _build_update_sql(table: str, key_column: str, fields: tuple) -> str:
+    """生成 UPDATE 语句（按字段组合缓存，相同组合复用同一 SQL 文本以命中语句缓存）"""
+    assignments = ", ".join(f"{field} = ?" for field in fields)
+    return f"UPDATE {table} SET {assignments} WHERE {key_column} = ?"
+
+
+@functools.lru_cache(maxsize=32)
+def _build_transition_sql(fields: tuple) -> str:
+    """生成带状态前置条件的工作流 UPDATE 语句（按字段组合缓存，参数顺序：新状态、字段值、工作流ID、原状态）"""
+    assignments = ", ".join(f"{field} = ?" for field in ("status", *fields))
+    return f"UPDATE workflows SET {assignments} WHERE workflow_id = ? AND status = ?"
+
+
+class BuildRow:
+    """
+    SSO 构建状态记录（__slots__ 轻量对象，按位置从查询元组构造，避免逐行创建字典）
+    
+    兼容字典式读取（row["build_id"] / row.get("job_name")），需要真正的字典时调用 to_dict()。
+    """
+    
+    __slots__ = _SSO_BUILD_COLUMNS
+    
+    def __init__(
+        self, build_id, submission_id, workflow_id, release_id, job_name,
+        service_name, job_id, build_status, build_start_time,
+        build_end_time, build_detail, notified, notification_time,
+        created_at, updated_at,
+    ):
+        self.build_id = build_id
+        self.submission_id = submission_id
+        self.workflow_id = workflow_id
+        self.release_id = release_id
+        self.job_name = job_name
+        self.service_name = service_name
+        self.job_id = job_id
+        self.build_status = build_status
+        self.build_start_time = build_start_time
+        self.build_end_time = build_end_time
+        self.build_detail = build_detail
+        self.notified = notified
+        self.notification_time = notification_time
+        self.created_at = created_at
+        self.updated_at = updated_at
+    
+    def __getitem__(self, key: str):
+        if key not in _SSO_BUILD_COLUMNS:
+            raise KeyError(key)
+        return getattr(self, key)
+    
+    def get(self, key: str, default=None):
+        if key not in _SSO_BUILD_COLUMNS:
+            return default
+        return getattr(self, key)
+    
+    def to_dict(self) -> Dict:
+        return {column: getattr(self, column) for column in _SSO_BUILD_COLUMNS}
+    
+    def __repr__(self) -> str:
+        return f"BuildRow(build_id={self.build_id!r}, build_status={self.build_status!r})"
+
+
+def _decode_build_rows(rows: List[tuple], parse_json: bool) -> List[BuildRow]:
+    """
+    将 sso_build_status 查询元组批量转换为 BuildRow（逐行热循环，不含 I/O）
+    
+    Args:
+        rows: 按 _SSO_BUILD_COLUMNS 顺序查询的元组列表
+        parse_json: 是否将 build_detail 解析为字典
+    """
+    results = []
+    # 热循环内用到的全局/属性提前绑定为局部变量，避免每行重复 LOAD_GLOBAL/LOAD_ATTR
+    append = results.append
+    loads = json_fast.loads
+    decode_errors = json_fast.DECODE_ERRORS
+    detail_idx = _SSO_BUILD_DETAIL_IDX
+    build_row = BuildRow
+    for row in rows:
+        record = build_row(*row)
+        # 解析 JSON 字段
+        build_detail = row[detail_idx]
+        # 空值/空对象走快速路径，不调用解析器
+        if not parse_json or not build_detail:
+            pass
+        elif build_detail == '{}':
+            record.build_detail = {}
+        else:
+            try:
+                record.build_detail = loads(build_detail)
+            except decode_errors:
+                pass
+        append(record)
+    return results
+
+
+def _rows_to_workflow_dicts(rows: Iterable[tuple]) -> Dict[str, dict]:
+    """
+    将 workflows 查询元组批量转换为 {workflow_id: 字典}（与 WorkflowManager._row_to_dict 逐行结果一致）
+    
+    Args:
+        rows: 按 _WORKFLOW_COLUMNS 顺序查询的元组（可直接传入游标逐行迭代）
+    """
+    results = {}
+    # 热循环内用到的全局/属性提前绑定为局部变量
+    columns = _WORKFLOW_COLUMNS
+    loads = json_fast.loads
+    decode_errors = json_fast.DECODE_ERRORS
+    group_messages_idx = _WF_GROUP_MESSAGES_IDX
+    for row in rows:
+        data = dict(zip(columns, row))
+        group_messages = row[group_messages_idx]
+        if group_messages:
+            try:
+                group_messages = loads(group_messages)
+            except decode_errors:
+                group_messages = {}
+        else:
+            group_messages = {}
+        data['group_messages'] = group_messages
+        results[row[0]] = data
+    return results
+
+
+# 建表语句：表名 -> DDL（_ensure_schema 先查询 sqlite_master，只执行缺失表的建表语句）
+_SCHEMA_TABLES: Dict[str, str] = {
+    "workflows": """
+        CREATE TABLE IF NOT EXISTS workflows (
+            workflow_id TEXT PRIMARY KEY,
+            timestamp INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            username TEXT NOT NULL,
+            submission_data TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            approver_id INTEGER,
+            approver_username TEXT,
+            approval_time TEXT,
+            approval_comment TEXT,
+            created_at TEXT NOT NULL,
+            synced_to_api INTEGER NOT NULL DEFAULT 0,
+            group_messages TEXT
+        )
+    """,
+    "workflow_messages": """
+        CREATE TABLE IF NOT EXISTS workflow_messages (
+            group_id INTEGER NOT NULL,
+            message_id INTEGER NOT NULL,
+            workflow_id TEXT NOT NULL,
+            PRIMARY KEY (group_id, message_id),
+            FOREIGN KEY (workflow_id) REFERENCES workflows(workflow_id) ON DELETE CASCADE
+        )
+    """,
+    "project_options": """
+        CREATE TABLE IF NOT EXISTS project_options (
+            config_key TEXT PRIMARY KEY,
+            config_value TEXT NOT NULL,
+            updated_at INTEGER NOT NULL
+        )
+    """,
+    "app_config": """
+        CREATE TABLE IF NOT EXISTS app_config (
+            config_key TEXT PRIMARY KEY,
+            config_value TEXT,
+            updated_at INTEGER NOT NULL
+        )
+    """,
+    # SSO 相关表
+    "sso_submissions": """
+        CREATE TABLE IF NOT EXISTS sso_submissions (
+            submission_id TEXT PRIMARY KEY,
+            workflow_id TEXT NOT NULL,
+            process_instance_id TEXT,
+            sso_order_data TEXT NOT NULL,
+            submit_status TEXT NOT NULL DEFAULT 'pending',
+            submit_time INTEGER NOT NULL,
+            submit_response TEXT,
+            error_message TEXT,
+            created_at TEXT NOT NULL,
+            updated_at TEXT NOT NULL,
+            FOREIGN KEY (workflow_id) REFERENCES workflows(workflow_id) ON DELETE CASCADE
+        )
+    """,
+    "sso_build_status": """
+        CREATE TABLE IF NOT EXISTS sso_build_status (
+            build_id TEXT PRIMARY KEY,
+            submission_id TEXT NOT NULL,
+            workflow_id TEXT NOT NULL,
+            release_id INTEGER NOT NULL,
+            job_name TEXT NOT NULL,
+            service_name TEXT,
+            job_id TEXT,
+            build_status TEXT NOT NULL DEFAULT 'BUILDING',
+            build_start_time INTEGER,
+            build_end_time INTEGER,
+            build_detail TEXT,
+            notified INTEGER NOT NULL DEFAULT 0,
+            notification_time INTEGER,
+            created_at TEXT NOT NULL,
+            updated_at TEXT NOT NULL,
+            FOREIGN KEY (submission_id) REFERENCES sso_submissions(submission_id) ON DELETE CASCADE,
+            FOREIGN KEY (workflow_id) REFERENCES workflows(workflow_id) ON DELETE CASCADE
+        )
+    """,
+    # SSO 构建通知队列（只保存已完成且待通知的构建，通知后出队，长度与在途通知数相关而非历史量）
+    "sso_notification_queue": """
+        CREATE TABLE IF NOT EXISTS sso_notification_queue (
+            build_id TEXT PRIMARY KEY,
+            enqueued_at INTEGER NOT NULL,
+            FOREIGN KEY (build_id) REFERENCES sso_build_status(build_id) ON DELETE CASCADE
+        )
+    """,
+    # Jenkins 构建表
+    "jenkins_builds": """
+        CREATE TABLE IF NOT EXISTS jenkins_builds (
+            build_id TEXT PRIMARY KEY,
+            workflow_id TEXT NOT NULL,
+            job_name TEXT NOT NULL,
+            job_url TEXT,
+            build_number INTEGER,
+            build_status TEXT NOT NULL DEFAULT 'BUILDING',
+            build_start_time INTEGER,
+            build_end_time INTEGER,
+            build_duration INTEGER,
+            build_console_output TEXT,
+            build_parameters TEXT,
+            notified INTEGER NOT NULL DEFAULT 0,
+            notification_time INTEGER,
+            created_at TEXT NOT NULL,
+            updated_at TEXT NOT NULL,
+            FOREIGN KEY (workflow_id) REFERENCES workflows(workflow_id) ON DELETE CASCADE
+        )
+    """,
+    # 新增：消息模板表
+    "message_templates": """
+        CREATE TABLE IF NOT EXISTS message_templates (
+            template_type TEXT NOT NULL,
+            project TEXT,
+            content TEXT NOT NULL,
+            updated_at INTEGER NOT NULL,
+            PRIMARY KEY (template_type, project)
+        )
+    """,
+}
+
+# SQLite 3.31+ 支持生成列：按天分桶列 day_bucket 及其索引仅在支持时创建，
+# 旧版本的按天汇总直接按 timestamp / 86400 计算
+_GENERATED_COLUMNS_SUPPORTED = sqlite3.sqlite_version_info >= (3, 31, 0)
+_DAY_BUCKET_EXPR = "day_bucket" if _GENERATED_COLUMNS_SUPPORTED else "(timestamp / 86400)"
+
+# 索引：索引名 -> DDL（依赖列迁移后的 project/template_type/day_bucket 列，只创建缺失的索引）
+_SCHEMA_INDEXES: Dict[str, str] = {
+    # 关键字段索引
+    "idx_workflows_created_at": "CREATE INDEX IF NOT EXISTS idx_workflows_created_at ON workflows(created_at)",
+    "idx_workflows_timestamp": "CREATE INDEX IF NOT EXISTS idx_workflows_timestamp ON workflows(timestamp)",
+    "idx_workflows_status": "CREATE INDEX IF NOT EXISTS idx_workflows_status ON workflows(status)",
+    "idx_workflows_user_id": "CREATE INDEX IF NOT EXISTS idx_workflows_user_id ON workflows(user_id)",
+    "idx_workflows_approver_id": "CREATE INDEX IF NOT EXISTS idx_workflows_approver_id ON workflows(approver_id)",
+    # 部分索引：只索引未同步到 API 的少量工作流，已同步行不参与索引维护
+    "idx_workflows_unsynced": "CREATE INDEX IF NOT EXISTS idx_workflows_unsynced ON workflows(timestamp) WHERE synced_to_api = 0",
+    "idx_workflow_messages_workflow_id": "CREATE INDEX IF NOT EXISTS idx_workflow_messages_workflow_id ON workflow_messages(workflow_id)",
+    "idx_workflows_status_timestamp": "CREATE INDEX IF NOT EXISTS idx_workflows_status_timestamp ON workflows(status, timestamp DESC)",
+    # 按状态+项目过滤的工作流列表（get_all_workflows）直接按时间倒序读取
+    "idx_workflows_status_project_timestamp": "CREATE INDEX IF NOT EXISTS idx_workflows_status_project_timestamp ON workflows(status, project, timestamp DESC)",
+    "idx_workflows_user_timestamp": "CREATE INDEX IF NOT EXISTS idx_workflows_user_timestamp ON workflows(user_id, timestamp DESC)",
+    "idx_workflows_approver_timestamp": "CREATE INDEX IF NOT EXISTS idx_workflows_approver_timestamp ON workflows(approver_id, timestamp DESC)",
+    "idx_sso_submissions_workflow_id": "CREATE INDEX IF NOT EXISTS idx_sso_submissions_workflow_id ON sso_submissions(workflow_id)",
+    "idx_sso_submissions_process_instance_id": "CREATE INDEX IF NOT EXISTS idx_sso_submissions_process_instance_id ON sso_submissions(process_instance_id)",
+    "idx_sso_build_status_workflow_id": "CREATE INDEX IF NOT EXISTS idx_sso_build_status_workflow_id ON sso_build_status(workflow_id)",
+    "idx_sso_build_status_submission_id": "CREATE INDEX IF NOT EXISTS idx_sso_build_status_submission_id ON sso_build_status(submission_id)",
+    "idx_sso_build_status_job_id": "CREATE INDEX IF NOT EXISTS idx_sso_build_status_job_id ON sso_build_status(job_id)",
+    "idx_sso_build_status_status": "CREATE INDEX IF NOT EXISTS idx_sso_build_status_status ON sso_build_status(build_status)",
+    # 性能优化：添加缺失的关键索引
+    # SSO submissions 查询优化索引
+    "idx_sso_submissions_workflow_time": "CREATE INDEX IF NOT EXISTS idx_sso_submissions_workflow_time ON sso_submissions(workflow_id, submit_time DESC)",
+    "idx_sso_submissions_submit_status": "CREATE INDEX IF NOT EXISTS idx_sso_submissions_submit_status ON sso_submissions(submit_status)",
+    "idx_sso_build_status_end_time": "CREATE INDEX IF NOT EXISTS idx_sso_build_status_end_time ON sso_build_status(build_end_time)",
+    # 通知队列按入队顺序出队
+    "idx_sso_notification_queue_enqueued": "CREATE INDEX IF NOT EXISTS idx_sso_notification_queue_enqueued ON sso_notification_queue(enqueued_at)",
+    # workflows 项目/模板类型查询优化索引
+    "idx_workflows_project_template": "CREATE INDEX IF NOT EXISTS idx_workflows_project_template ON workflows(project, template_type)",
+    "idx_workflows_project": "CREATE INDEX IF NOT EXISTS idx_workflows_project ON workflows(project)",
+    # Jenkins builds 通知查询优化索引
+    "idx_jenkins_builds_notify": "CREATE INDEX IF NOT EXISTS idx_jenkins_builds_notify ON jenkins_builds(build_status, notified, build_end_time)",
+    # 部分索引：仅包含已完成且未通知的 Jenkins 构建，按 build_end_time 有序，待通知轮询无需扫描历史构建和排序
+    "idx_jenkins_builds_pending_partial": "CREATE INDEX IF NOT EXISTS idx_jenkins_builds_pending_partial ON jenkins_builds(build_end_time) WHERE notified = 0 AND build_status IN ('SUCCESS', 'FAILURE', 'ABORTED', 'UNSTABLE')",
+    "idx_jenkins_builds_end_time": "CREATE INDEX IF NOT EXISTS idx_jenkins_builds_end_time ON jenkins_builds(build_end_time)",
+    # 添加文档建议的复合索引：用于根据 workflow_id, job_name, build_number 查询
+    "idx_jenkins_by_workflow_job_number": "CREATE INDEX IF NOT EXISTS idx_jenkins_by_workflow_job_number ON jenkins_builds(workflow_id, job_name, build_number)",
+    "idx_jenkins_build_status": "CREATE INDEX IF NOT EXISTS idx_jenkins_build_status ON jenkins_builds(build_status)",
+}
+if _GENERATED_COLUMNS_SUPPORTED:
+    _SCHEMA_INDEXES["idx_workflows_day"] = "CREATE INDEX IF NOT EXISTS idx_workflows_day ON workflows(day_bucket, status)"
+
+# 已废弃的索引（被主键或复合索引覆盖，只增加写放大），存在时删除
+_OBSOLETE_INDEXES = (
+    # workflow_id 已由主键自动索引覆盖
+    "idx_workflows_workflow_id",
+    # 已由部分索引 idx_workflows_unsynced 取代
+    "idx_workflows_synced_to_api",
+    # Telegram 消息ID只在会话内唯一，映射表按 (group_id, message_id) 复合主键查找，以下索引已被主键覆盖
+    "idx_workflow_messages_message_id",
+    "idx_workflow_messages_group_id",
+    "idx_workflows_message_id_lookup",
+    # 待通知 SSO 构建改为从 sso_notification_queue 读取，以下索引不再被查询使用，只增加更新开销
+    "idx_sso_build_status_notified",
+    "idx_sso_build_status_notify",
+    "idx_sso_build_pending",
+    "idx_sso_build_pending_partial",
+    # build_id 已由主键自动索引覆盖
+    "idx_jenkins_build_build_id",
+    # 单列 notified 索引已被部分索引 idx_jenkins_builds_pending_partial 取代
+    "idx_jenkins_builds_notified",
+)
+
+# 通知队列对账：已完成但尚未通知、且不在队列中的构建补入队列（兼容引入队列前的历史数据）
+_SQL_BACKFILL_NOTIFICATION_QUEUE = """
+    INSERT OR IGNORE INTO sso_notification_queue (build_id, enqueued_at)
+    SELECT build_id, COALESCE(build_end_time, 0) FROM sso_build_status
+    WHERE notified = 0 AND build_status IN ('SUCCESS', 'FAILURE', 'ABORTED')
+"""
+
+# 旧版消息映射表以 message_id 为唯一主键（不同群组的相同消息ID会互相覆盖），重建为 (group_id, message_id) 复合主键
+_SQL_REKEY_WORKFLOW_MESSAGES = (
+    "ALTER TABLE workflow_messages RENAME TO workflow_messages_legacy",
+    _SCHEMA_TABLES["workflow_messages"],
+    """
+    INSERT OR IGNORE INTO workflow_messages (group_id, message_id, workflow_id)
+    SELECT group_id, message_id, workflow_id FROM workflow_messages_legacy
+    """,
+    "DROP TABLE workflow_messages_legacy",
+)
+
 
 class WorkflowManager:
     """工作流管理器（SQLite 时序数据库存储）"""
@@ -23,364 +529,455 @@ class WorkflowManager:
     # SQLite 数据库文件路径
     DB_FILE = DATA_DIR / "workflows.db"
     
-    # 数据库连接策略：使用短生命周期连接，避免跨线程问题
+    # 数据库连接策略：每个线程持有自己的写连接和只读连接（threading.local），
+    # WAL 下读者互不阻塞；进程内写者先经 _write_lock 排队（避免 busy_timeout 的轮询退避），
+    # 跨进程写者仍由 SQLite 文件锁（BEGIN IMMEDIATE + busy_timeout）协调
     _schema_initialized: bool = False
+    _schema_lock = threading.Lock()
+    _write_lock = threading.Lock()  # 仅在最外层 _get_write_conn 获取，嵌套获取不重复加锁
+    _tls = threading.local()  # 属性：write_conn / read_conn / write_depth（写连接嵌套获取深度）/ in_batch（处于 batch() 中）/ after_commit（batch 提交后回调）
+    _optimize_registered: bool = False  # 是否已注册退出时的 PRAGMA optimize
+    _wal_enabled: bool = False  # 本进程是否已将数据库切换为 WAL 模式
+    _templates_initialized: bool = False  # 本进程是否已写入缺省消息模板
+    _delete_limit_supported: Optional[bool] = None  # SQLite 是否支持 DELETE ... LIMIT（首次清理时探测）
     
     # 数据保留天数（60天）
     RETENTION_DAYS = 60
     
+    # 配置进程内缓存（项目配置/应用配置读多写少），写入时递增版本号并清空
+    _cache_lock = threading.RLock()
+    _cache_version: int = 0
+    # 缓存有效期（秒）：兜底其他进程（如 scripts/ 下的脚本）直接修改数据库的情况
+    CONFIG_CACHE_TTL = 60
+    _cache_expires_at: float = 0.0  # time.monotonic() 时刻，到期后检查配置是否变化
+    _config_snapshot: Optional[tuple] = None  # 上次到期检查时读取的配置快照
+    _project_options_cache: Optional[Dict] = None
+    _app_config_cache: Dict[str, Optional[str]] = {}
+    
+    # 整型应用配置解析缓存：(key, default) -> int，随配置缓存一起失效
+    _app_config_int_cache: Dict[tuple, int] = {}
+    
+    # 配置变更监听器（应用配置/项目配置写入成功后回调，用于刷新各模块的派生缓存）
+    _config_listeners: List[Callable[[], None]] = []
+    
+    # (群组ID, 消息ID) -> 工作流ID 映射缓存（按钮回调热路径，映射写入后基本不变）：
+    # 写入消息映射时同步更新，删除/清理工作流时清空；只缓存命中的映射，不缓存"不存在"
+    MESSAGE_CACHE_MAX_SIZE = 16384
+    _message_workflow_ids: Dict[Tuple[int, int], str] = {}
+    
     @classmethod
-    def _create_connection(cls) -> sqlite3.Connection:
+    def _is_memory_db(cls) -> bool:
+        """是否为内存数据库（内存库无法跨连接共享，读操作也走写连接；每个线程各自一个独立内存库）"""
+        return str(cls.DB_FILE) == ":memory:"
+    
+    @classmethod
+    def _create_connection(cls, read_only: bool = False) -> sqlite3.Connection:
         """
-        创建新的数据库连接（短生命周期，每次操作使用独立连接）
+        创建新的数据库连接（长生命周期，由当前线程的 _tls 持有）
         
-        这样可以避免跨线程使用同一连接导致的线程安全问题。
-        每次调用都会创建新连接，使用后应立即关闭。
+        Args:
+            read_only: 是否以只读模式（mode=ro）打开，用于读路径
         """
-        # 确保数据目录存在
-        cls.DATA_DIR.mkdir(exist_ok=True)
-        
-        # 创建连接，启用外键约束
-        conn = sqlite3.connect(
-            str(cls.DB_FILE),
-            timeout=30.0,  # 30秒超时
-            isolation_level='DEFERRED'  # 使用显式事务模式，支持手动 commit()/rollback()
-        )
+        if read_only:
+            conn = sqlite3.connect(
+                f"{Path(cls.DB_FILE).resolve().as_uri()}?mode=ro",
+                uri=True,
+                timeout=30.0,
+                cached_statements=STATEMENT_CACHE_SIZE,
+            )
+        else:
+            # 确保数据目录存在
+            if not cls._is_memory_db():
+                cls.DATA_DIR.mkdir(exist_ok=True)
+            
+            # 创建连接，启用外键约束
+            conn = sqlite3.connect(
+                str(cls.DB_FILE),
+                timeout=30.0,  # 30秒超时
+                cached_statements=STATEMENT_CACHE_SIZE,
+                # 隐式事务以 BEGIN IMMEDIATE 开启：写事务一开始就取得写锁，
+                # 多个线程的写连接竞争时由 busy_timeout 排队，而不是读锁升级时报 database is locked
+                isolation_level='IMMEDIATE',
+            )
         conn.row_factory = sqlite3.Row  # 返回字典式行对象
         
+        # 连接级 PRAGMA 拼成一个脚本，一次 executescript 下发（新连接上没有待提交事务）
+        pragmas = []
         # 性能优化：启用WAL模式（Write-Ahead Logging）提升并发性能
-        conn.execute("PRAGMA journal_mode = WAL")
-        # 设置忙等待超时（毫秒），减少锁冲突
-        conn.execute("PRAGMA busy_timeout = 5000")
-        # 优化同步模式：NORMAL模式在WAL下更安全且性能更好
-        conn.execute("PRAGMA synchronous = NORMAL")
-        # 启用外键约束
-        conn.execute("PRAGMA foreign_keys = ON")
-        # 优化缓存大小（2MB，可根据需要调整）
-        conn.execute("PRAGMA cache_size = -2048")
-        # 优化临时存储
-        conn.execute("PRAGMA temp_store = MEMORY")
+        # 内存数据库不支持 WAL/mmap，跳过文件级 PRAGMA；journal_mode 由写连接设置
+        if not cls._is_memory_db():
+            if not read_only:
+                # WAL 模式持久化在数据库文件中，每个进程只需设置一次（后续线程的写连接跳过）
+                if not cls._wal_enabled:
+                    pragmas.append("journal_mode = WAL")
+                # WAL 自动检查点（页数，连接级设置），限制 WAL 文件增长
+                pragmas.append("wal_autocheckpoint = 1000")
+            # 内存映射读取（256MB），减少读路径的系统调用和页拷贝
+            pragmas.append("mmap_size = 268435456")
+        pragmas.extend((
+            # 设置忙等待超时（毫秒），写事务提交期间读者等待而不是立即报错
+            "busy_timeout = 30000",
+            # 优化同步模式：NORMAL模式在WAL下更安全且性能更好
+            "synchronous = NORMAL",
+            # 启用外键约束
+            "foreign_keys = ON",
+            # 页缓存（64MB）：索引较多，热点页常驻内存，重复查询不再读盘
+            f"cache_size = -{PAGE_CACHE_KIB}",
+            # 优化临时存储
+            "temp_store = MEMORY",
+        ))
+        conn.executescript("".join(f"PRAGMA {pragma};" for pragma in pragmas))
+        if not read_only and not cls._is_memory_db():
+            cls._wal_enabled = True
+        
+        return conn
+    
+    @classmethod
+    def _ensure_schema_once(cls, conn: sqlite3.Connection):
+        """进程内首次获取写连接时初始化表结构（多线程并发首次访问时只执行一次）"""
+        if cls._schema_initialized:
+            return
+        with cls._schema_lock:
+            if not cls._schema_initialized:
+                cls._ensure_schema(conn)
+                cls._schema_initialized = True
+    
+    @classmethod
+    def _thread_write_conn(cls) -> sqlite3.Connection:
+        """获取当前线程的写连接（首次调用时创建并缓存，之后每次调用直接复用）"""
+        tls = cls._tls
+        conn = getattr(tls, "write_conn", None)
+        if conn is None:
+            conn = tls.write_conn = cls._create_connection()
+            if not cls._optimize_registered:
+                cls._optimize_registered = True
+                atexit.register(cls._optimize_on_exit)
         
+        # 确保表结构（仅在首次初始化时执行）
+        cls._ensure_schema_once(conn)
+        return conn
+    
+    @classmethod
+    def _thread_read_conn(cls) -> sqlite3.Connection:
+        """获取当前线程的只读连接（首次调用时创建并缓存；内存数据库返回写连接）"""
+        if cls._is_memory_db():
+            return cls._thread_write_conn()
+        
+        # 首次使用前由写连接创建数据库文件和表结构
+        if not cls._schema_initialized:
+            cls._thread_write_conn()
+        
+        tls = cls._tls
+        conn = getattr(tls, "read_conn", None)
+        if conn is None:
+            conn = tls.read_conn = cls._create_connection(read_only=True)
         return conn
     
     @classmethod
     @contextmanager
-    def _get_connection(cls):
+    def _get_write_conn(cls):
         """
-        获取数据库连接的上下文管理器（推荐使用方式）
+        获取当前线程写连接的上下文管理器（每个线程一个长生命周期连接）
+        
+        最外层获取时持有进程级写锁，同一时刻只有一个线程在写；
+        支持同一线程内嵌套获取（外层可包裹一个跨多个方法的事务）；
+        最外层退出时若仍有未提交的事务（异常或遗漏 commit）会自动回滚，
+        保证连接始终处于干净状态。
         
         使用示例:
-            with cls._get_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute("SELECT ...")
+            with cls._get_write_conn() as conn:
+                cursor = conn.execute("UPDATE ...")
                 conn.commit()
         """
-        conn = cls._create_connection()
+        conn = cls._thread_write_conn()
+        tls = cls._tls
+        depth = getattr(tls, "write_depth", 0)
+        # 内存数据库每个线程各自独立，无需跨线程串行化
+        locked = depth == 0 and not cls._is_memory_db()
+        if locked:
+            cls._write_lock.acquire()
+        tls.write_depth = depth + 1
+        try:
+            yield conn
+        finally:
+            tls.write_depth = depth
+            try:
+                if depth == 0 and conn.in_transaction:
+                    conn.rollback()
+            finally:
+                if locked:
+                    cls._write_lock.release()
+    
+    @classmethod
+    @contextmanager
+    def batch(cls):
+        """
+        批量写入上下文：块内所有写方法共享一个 BEGIN IMMEDIATE 事务，退出时只提交一次
         
-        # 确保表结构（仅在首次初始化时执行）
-        if not cls._schema_initialized:
-            cls._ensure_schema(conn)
-            cls._schema_initialized = True
+        块内各写方法跳过自身的 commit，正常退出时统一提交，抛出异常时整体回滚；
+        块外失败时记录日志并返回 False 的写方法，在块内改为抛出异常，使整个块回滚而不是部分提交；
+        块内的读方法使用同一个写连接，能读到块内尚未提交的写入。
+        配置写入的缓存失效与监听器通知推迟到提交之后执行。清理旧数据（cleanup_old_data）
+        需要逐批提交，不能在块内调用。嵌套使用或已在外层事务中时并入外层事务。块内持有进程级写锁，只放数据库写入，
+        不要在块内 await 网络请求等耗时操作。
         
+        使用示例:
+            with WorkflowManager.batch():
+                for build_id in build_ids:
+                    WorkflowManager.mark_jenkins_build_notified(build_id)
+        """
+        with cls._get_write_conn() as conn:
+            tls = cls._tls
+            if cls._in_batch() or conn.in_transaction:
+                yield conn
+                return
+            
+            conn.execute("BEGIN IMMEDIATE")
+            tls.in_batch = True
+            tls.after_commit = []
+            try:
+                yield conn
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                # 写穿缓存中可能有已回滚的消息映射
+                cls._message_workflow_ids.clear()
+                raise
+            else:
+                # 提交成功后再执行缓存失效等回调，回滚时丢弃
+                for callback in tls.after_commit:
+                    callback()
+            finally:
+                tls.in_batch = False
+                tls.after_commit = []
+    
+    @classmethod
+    def _in_batch(cls) -> bool:
+        """当前线程是否处于 batch() 块中"""
+        return getattr(cls._tls, "in_batch", False)
+    
+    @classmethod
+    def _commit(cls, conn: sqlite3.Connection):
+        """提交写事务（处于 batch() 中时跳过，由 batch() 退出时统一提交）"""
+        if not cls._in_batch():
+            conn.commit()
+    
+    @classmethod
+    def _after_commit(cls, callback: Callable[[], None]):
+        """在写入提交后执行回调（处于 batch() 中时推迟到 batch() 提交之后，回滚则不执行）"""
+        if cls._in_batch():
+            cls._tls.after_commit.append(callback)
+        else:
+            callback()
+    
+    @classmethod
+    def _optimize_on_exit(cls):
+        """进程退出时在主线程写连接上执行 PRAGMA optimize（按本连接的查询历史按需更新统计信息）"""
+        conn = getattr(cls._tls, "write_conn", None)
+        if conn is None:
+            return
+        try:
+            conn.execute("PRAGMA optimize")
+        except sqlite3.Error as e:
+            logger.debug(f"退出时执行 PRAGMA optimize 失败: {e}")
+    
+    @classmethod
+    @contextmanager
+    def _get_read_conn(cls):
+        """
+        获取当前线程只读连接的上下文管理器（仅用于 SELECT）
+        
+        处于 batch() 中时改用本线程的写连接，块内读取能看到块内尚未提交的写入。
+        
+        使用示例:
+            with cls._get_read_conn() as conn:
+                cursor = conn.execute("SELECT ...")
+        """
+        if cls._is_memory_db() or cls._in_batch():
+            with cls._get_write_conn() as conn:
+                yield conn
+            return
+        
+        conn = cls._thread_read_conn()
         try:
             yield conn
         finally:
-            conn.close()
+            if conn.in_transaction:
+                conn.rollback()
+    
+    @classmethod
+    @contextmanager
+    def _get_connection(cls):
+        """获取数据库连接的上下文管理器（兼容旧调用，等同于写连接）"""
+        with cls._get_write_conn() as conn:
+            yield conn
 
     # ------------------------------------------------------------------ schema helpers
     @classmethod
     def _ensure_column(cls, cursor: sqlite3.Cursor, table: str, column: str, definition: str):
-        """如果列不存在则新增"""
-        cursor.execute(f"PRAGMA table_info({table})")
+        """如果列不存在则新增（table_xinfo 同时列出生成列）"""
+        cursor.execute(f"PRAGMA table_xinfo({table})")
         columns = [row[1] for row in cursor.fetchall()]
         if column not in columns:
             cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
 
+    @staticmethod
+    def _has_legacy_message_key(conn: sqlite3.Connection) -> bool:
+        """消息映射表是否仍是旧版的 message_id 单列主键"""
+        pk_columns = [row[1] for row in conn.execute("PRAGMA table_info(workflow_messages)") if row[5]]
+        return pk_columns == ["message_id"]
+    
     @classmethod
     def _ensure_schema(cls, conn: sqlite3.Connection):
-        """初始化/迁移表结构（幂等）"""
-        cursor = conn.cursor()
-
-        # 原有表结构
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS workflows (
-                workflow_id TEXT PRIMARY KEY,
-                timestamp INTEGER NOT NULL,
-                user_id INTEGER NOT NULL,
-                username TEXT NOT NULL,
-                submission_data TEXT NOT NULL,
-                status TEXT NOT NULL DEFAULT 'pending',
-                approver_id INTEGER,
-                approver_username TEXT,
-                approval_time TEXT,
-                approval_comment TEXT,
-                created_at TEXT NOT NULL,
-                synced_to_api INTEGER NOT NULL DEFAULT 0,
-                group_messages TEXT
-            )
-        """)
-
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS workflow_messages (
-                message_id INTEGER PRIMARY KEY,
-                workflow_id TEXT NOT NULL,
-                group_id INTEGER NOT NULL,
-                FOREIGN KEY (workflow_id) REFERENCES workflows(workflow_id) ON DELETE CASCADE
-            )
-        """)
-
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS project_options (
-                config_key TEXT PRIMARY KEY,
-                config_value TEXT NOT NULL,
-                updated_at INTEGER NOT NULL
-            )
-        """)
-
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS app_config (
-                config_key TEXT PRIMARY KEY,
-                config_value TEXT,
-                updated_at INTEGER NOT NULL
-            )
-        """)
-
-        # SSO 相关表
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS sso_submissions (
-                submission_id TEXT PRIMARY KEY,
-                workflow_id TEXT NOT NULL,
-                process_instance_id TEXT,
-                sso_order_data TEXT NOT NULL,
-                submit_status TEXT NOT NULL DEFAULT 'pending',
-                submit_time INTEGER NOT NULL,
-                submit_response TEXT,
-                error_message TEXT,
-                created_at TEXT NOT NULL,
-                updated_at TEXT NOT NULL,
-                FOREIGN KEY (workflow_id) REFERENCES workflows(workflow_id) ON DELETE CASCADE
-            )
-        """)
-
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS sso_build_status (
-                build_id TEXT PRIMARY KEY,
-                submission_id TEXT NOT NULL,
-                workflow_id TEXT NOT NULL,
-                release_id INTEGER NOT NULL,
-                job_name TEXT NOT NULL,
-                service_name TEXT,
-                job_id TEXT,
-                build_status TEXT NOT NULL DEFAULT 'BUILDING',
-                build_start_time INTEGER,
-                build_end_time INTEGER,
-                build_detail TEXT,
-                notified INTEGER NOT NULL DEFAULT 0,
-                notification_time INTEGER,
-                created_at TEXT NOT NULL,
-                updated_at TEXT NOT NULL,
-                FOREIGN KEY (submission_id) REFERENCES sso_submissions(submission_id) ON DELETE CASCADE,
-                FOREIGN KEY (workflow_id) REFERENCES workflows(workflow_id) ON DELETE CASCADE
-            )
-        """)
-
-        # Jenkins 构建表
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS jenkins_builds (
-                build_id TEXT PRIMARY KEY,
-                workflow_id TEXT NOT NULL,
-                job_name TEXT NOT NULL,
-                job_url TEXT,
-                build_number INTEGER,
-                build_status TEXT NOT NULL DEFAULT 'BUILDING',
-                build_start_time INTEGER,
-                build_end_time INTEGER,
-                build_duration INTEGER,
-                build_console_output TEXT,
-                build_parameters TEXT,
-                notified INTEGER NOT NULL DEFAULT 0,
-                notification_time INTEGER,
-                created_at TEXT NOT NULL,
-                updated_at TEXT NOT NULL,
-                FOREIGN KEY (workflow_id) REFERENCES workflows(workflow_id) ON DELETE CASCADE
+        """
+        初始化/迁移表结构（幂等）
+        
+        先用一次 sqlite_master 查询取得已有的表和索引，只执行缺失对象的 DDL：
+        已初始化的数据库（常规启动）不再逐条解析 CREATE ... IF NOT EXISTS。
+        缺失的建表语句、旧版消息映射表重建与列迁移在同一个 BEGIN IMMEDIATE 事务中执行，缺失的索引与通知队列对账
+        作为一个脚本单独提交（executescript 执行前会先提交当前事务）。仅在进程首次获取写连接时调用。
+        """
+        existing = {
+            row[0] for row in conn.execute(
+                "SELECT name FROM sqlite_master WHERE type IN ('table', 'index')"
             )
-        """)
-
-        # 新增：消息模板表
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS message_templates (
-                template_type TEXT NOT NULL,
-                project TEXT,
-                content TEXT NOT NULL,
-                updated_at INTEGER NOT NULL,
-                PRIMARY KEY (template_type, project)
+        }
+        
+        missing_tables = [ddl for name, ddl in _SCHEMA_TABLES.items() if name not in existing]
+        if "workflow_messages" in existing and cls._has_legacy_message_key(conn):
+            # 重建表会连同旧索引一起删除，需要重新创建
+            missing_tables.extend(_SQL_REKEY_WORKFLOW_MESSAGES)
+            existing.difference_update(
+                name for name, ddl in _SCHEMA_INDEXES.items() if " ON workflow_messages(" in ddl
             )
-        """)
-
-        # 迁移新增列
+        index_statements = [ddl for name, ddl in _SCHEMA_INDEXES.items() if name not in existing]
+        index_statements.extend(
+            f"DROP INDEX IF EXISTS {name}" for name in _OBSOLETE_INDEXES if name in existing
+        )
+        # 通知队列对账每次都执行（INSERT OR IGNORE 幂等，只扫描待通知部分索引）
+        index_statements.append(_SQL_BACKFILL_NOTIFICATION_QUEUE)
+        
+        try:
+            if missing_tables:
+                conn.executescript("BEGIN IMMEDIATE;\n" + ";\n".join(missing_tables) + ";")
+            cls._migrate_columns(conn.cursor())
+            conn.executescript("BEGIN IMMEDIATE;\n" + ";\n".join(index_statements) + ";\nCOMMIT;")
+        except Exception:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+    
+    @classmethod
+    def _migrate_columns(cls, cursor: sqlite3.Cursor):
+        """为旧数据库补充后续版本新增的列（由 _ensure_schema 调用，有缺失表时并入建表事务）"""
         cls._ensure_column(cursor, "workflows", "project", "TEXT")
         cls._ensure_column(cursor, "workflows", "template_type", "TEXT")
-
-        # 索引（保留原有，存在则跳过）
-        # 关键字段索引
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_workflows_workflow_id 
-            ON workflows(workflow_id)
-        """)
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_workflows_created_at 
-            ON workflows(created_at)
-        """)
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_workflows_timestamp 
-            ON workflows(timestamp)
-        """)
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_workflows_status 
-            ON workflows(status)
-        """)
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_workflows_user_id 
-            ON workflows(user_id)
-        """)
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_workflows_approver_id 
-            ON workflows(approver_id)
-        """)
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_workflows_synced_to_api 
-            ON workflows(synced_to_api)
-        """)
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_workflow_messages_workflow_id 
-            ON workflow_messages(workflow_id)
-        """)
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_workflow_messages_group_id 
-            ON workflow_messages(group_id)
-        """)
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_workflow_messages_message_id 
-            ON workflow_messages(message_id)
-        """)
-        # 添加文档建议的索引：message_id 用于根据消息ID查找工作流
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_workflows_message_id_lookup 
-            ON workflow_messages(message_id, workflow_id)
-        """)
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_workflows_status_timestamp 
-            ON workflows(status, timestamp DESC)
-        """)
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_workflows_user_timestamp 
-            ON workflows(user_id, timestamp DESC)
-        """)
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_workflows_approver_timestamp 
-            ON workflows(approver_id, timestamp DESC)
-        """)
-
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_sso_submissions_workflow_id 
-            ON sso_submissions(workflow_id)
-        """)
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_sso_submissions_process_instance_id 
-            ON sso_submissions(process_instance_id)
-        """)
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_sso_build_status_workflow_id 
-            ON sso_build_status(workflow_id)
-        """)
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_sso_build_status_submission_id 
-            ON sso_build_status(submission_id)
-        """)
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_sso_build_status_job_id 
-            ON sso_build_status(job_id)
-        """)
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_sso_build_status_status 
-            ON sso_build_status(build_status)
-        """)
-        
-        # 性能优化：添加缺失的关键索引
-        # SSO submissions 查询优化索引
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_sso_submissions_workflow_time 
-            ON sso_submissions(workflow_id, submit_time DESC)
-        """)
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_sso_submissions_submit_status 
-            ON sso_submissions(submit_status)
-        """)
-        
-        # SSO build status 通知查询优化索引（复合索引覆盖常用查询）
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_sso_build_status_notify 
-            ON sso_build_status(build_status, notified, build_end_time)
-        """)
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_sso_build_status_notified 
-            ON sso_build_status(notified)
-        """)
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_sso_build_status_end_time 
-            ON sso_build_status(build_end_time)
-        """)
-        
-        # workflows 项目/模板类型查询优化索引
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_workflows_project_template 
-            ON workflows(project, template_type)
-        """)
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_workflows_project 
-            ON workflows(project)
-        """)
-        
-        # Jenkins builds 通知查询优化索引
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_jenkins_builds_notify 
-            ON jenkins_builds(build_status, notified, build_end_time)
-        """)
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_jenkins_builds_notified 
-            ON jenkins_builds(notified)
-        """)
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_jenkins_builds_end_time 
-            ON jenkins_builds(build_end_time)
-        """)
-        # 添加文档建议的复合索引：用于根据 workflow_id, job_name, build_number 查询
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_jenkins_by_workflow_job_number 
-            ON jenkins_builds(workflow_id, job_name, build_number)
-        """)
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_jenkins_build_status 
-            ON jenkins_builds(build_status)
-        """)
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_jenkins_build_build_id 
-            ON jenkins_builds(build_id)
-        """)
-
-        conn.commit()
+        # 按天分桶的生成列（UTC 天序号），日/月汇总直接走索引范围扫描；
+        # ALTER TABLE 只能添加 VIRTUAL 生成列，值在读取时由 timestamp 计算
+        if _GENERATED_COLUMNS_SUPPORTED:
+            cls._ensure_column(
+                cursor, "workflows", "day_bucket",
+                "INTEGER GENERATED ALWAYS AS (timestamp / 86400) VIRTUAL",
+            )
     
     @classmethod
     def _init_database(cls):
         """初始化数据库表结构（委托 _ensure_schema，避免重复定义）"""
-        conn = cls._create_connection()
-        try:
-            cls._ensure_schema(conn)
-            conn.commit()
-            cls._schema_initialized = True
-            logger.info("✅ 数据库表结构和索引初始化完成（幂等）")
-        finally:
-            conn.close()
+        with cls._get_write_conn() as conn:
+            # 首次获取写连接时已执行 _ensure_schema；顺便输出数据库大小，便于评估缓存/mmap 配置
+            page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+            page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+        logger.info("✅ 数据库表结构和索引初始化完成（幂等）")
+        logger.info(
+            f"📊 数据库大小: {page_count * page_size / 1024 / 1024:.1f} MB "
+            f"（页缓存上限 {PAGE_CACHE_KIB // 1024} MB/连接，mmap 256 MB）"
+        )
+    
+    @classmethod
+    def register_config_listener(cls, callback: Callable[[], None]):
+        """
+        注册配置变更监听器（幂等）
+        
+        Args:
+            callback: 无参回调，在 update_app_config / update_project_options 成功后调用
+        """
+        if callback not in cls._config_listeners:
+            cls._config_listeners.append(callback)
+    
+    @classmethod
+    def _invalidate_config_cache(cls):
+        """配置写入后使进程内配置缓存失效"""
+        with cls._cache_lock:
+            cls._cache_version += 1
+            cls._project_options_cache = None
+            cls._app_config_cache = {}
+            cls._app_config_int_cache = {}
+    
+    @classmethod
+    def _expire_config_cache(cls):
+        """
+        配置缓存超过 CONFIG_CACHE_TTL 后重新读取配置快照，与上次快照不同
+        （其他进程修改了数据库）时才使缓存失效并通知监听器，未变化时只延长有效期
+        """
+        if time.monotonic() < cls._cache_expires_at:
+            return
+        with cls._cache_lock:
+            now = time.monotonic()
+            if now < cls._cache_expires_at:
+                return
+            cls._cache_expires_at = now + cls.CONFIG_CACHE_TTL
+        
+        with cls._get_read_conn() as conn:
+            snapshot = tuple(tuple(row) for row in conn.execute(_SQL_CONFIG_SNAPSHOT))
+        with cls._cache_lock:
+            previous, cls._config_snapshot = cls._config_snapshot, snapshot
+            # 首次检查时缓存尚未从数据库加载，只记录快照
+            if previous is None or previous == snapshot:
+                return
+            cls._invalidate_config_cache()
+        cls._notify_config_changed()
+    
+    @classmethod
+    def _store_config_cache(cls, version: int, store: Callable[[], None]):
+        """仅当读取期间配置未被修改时写入缓存，避免并发写入后缓存旧值"""
+        with cls._cache_lock:
+            if version == cls._cache_version:
+                store()
+    
+    @classmethod
+    def _notify_config_changed(cls):
+        """通知所有监听器配置已变更（单个监听器异常不影响其他监听器）"""
+        for callback in list(cls._config_listeners):
+            try:
+                callback()
+            except Exception as e:
+                logger.error(f"配置变更监听器执行失败: {str(e)}", exc_info=True)
+    
+    @classmethod
+    def _config_written(cls):
+        """配置写入提交后使缓存失效并通知监听器"""
+        cls._invalidate_config_cache()
+        cls._notify_config_changed()
+    
+    @staticmethod
+    def _normalize_project_proxy_types(options_data: Dict) -> Dict:
+        """
+        写入前规范化各项目代理配置中的 type 字段
+        
+        返回规范化后的副本（只复制被修改的路径上的字典），不修改调用方传入的配置
+        """
+        projects = options_data.get('projects') if isinstance(options_data, dict) else None
+        if not isinstance(projects, dict):
+            return options_data
+        normalized_projects = dict(projects)
+        for name, project_config in projects.items():
+            proxy_config = project_config.get('proxy') if isinstance(project_config, dict) else None
+            if isinstance(proxy_config, dict) and proxy_config.get('enabled'):
+                normalized_projects[name] = {
+                    **project_config,
+                    'proxy': {**proxy_config, 'type': normalize_proxy_type(proxy_config.get('type'))},
+                }
+        return {**options_data, 'projects': normalized_projects}
     
     @classmethod
     def _init_project_options(cls, options_file: Path = None, force_update: bool = False):
@@ -391,14 +988,14 @@ class WorkflowManager:
             options_file: 配置文件路径
             force_update: 是否强制更新（即使数据库中已有配置也更新）
         """
-        with cls._get_connection() as conn:
+        with cls._get_write_conn() as conn:
             cursor = conn.cursor()
             
-            # 检查数据库中是否已有配置
-            cursor.execute("SELECT COUNT(*) FROM project_options WHERE config_key = 'projects'")
-            count = cursor.fetchone()[0]
+            # 检查数据库中是否已有配置（存在性探测，命中主键即返回）
+            cursor.execute("SELECT 1 FROM project_options WHERE config_key = 'projects' LIMIT 1")
+            exists = cursor.fetchone() is not None
             
-            if count > 0 and not force_update:
+            if exists and not force_update:
                 logger.info("项目配置已存在于数据库中，跳过初始化")
                 return
             
@@ -411,25 +1008,25 @@ class WorkflowManager:
                 raise FileNotFoundError(f"项目配置文件不存在: {options_file}")
             
             try:
-                with open(options_file, 'r', encoding='utf-8') as f:
-                    options_data = json.load(f)
+                # 以字节读取后交给 json_fast 解析（orjson 直接解析 UTF-8 字节，无需先解码）
+                options_data = json_fast.loads(options_file.read_bytes())
                 logger.info(f"从文件加载项目配置: {options_file}")
             except Exception as e:
                 logger.error(f"读取项目配置文件失败: {str(e)}", exc_info=True)
                 raise
             
+            options_data = cls._normalize_project_proxy_types(options_data)
+            
             # 将配置存储到数据库（使用事务优化批量操作）
             timestamp = int(time.time())
             try:
-                cursor.execute("""
-                    INSERT OR REPLACE INTO project_options (config_key, config_value, updated_at)
-                    VALUES (?, ?, ?)
-                """, ("projects", json.dumps(options_data, ensure_ascii=False), timestamp))
+                cursor.execute(_SQL_UPSERT_PROJECT_OPTIONS, ("projects", json_fast.dumps(options_data), timestamp))
                 
-                conn.commit()
+                cls._commit(conn)
             except Exception as e:
                 conn.rollback()
                 raise
+            cls._after_commit(cls._config_written)
             if force_update:
                 logger.info("✅ 项目配置已更新到数据库")
             else:
@@ -437,87 +1034,84 @@ class WorkflowManager:
     
     @classmethod
     def get_project_options(cls) -> Dict:
-        """从数据库获取项目配置"""
-        with cls._get_connection() as conn:
-            cursor = conn.cursor()
-            
-            cursor.execute("""
+        """
+        获取项目配置（进程内缓存，配置更新或超过 TTL 时失效）
+        
+        返回的字典为共享缓存，调用方不应修改
+        """
+        cls._expire_config_cache()
+        cached = cls._project_options_cache
+        if cached is not None:
+            return cached
+        
+        version = cls._cache_version
+        with cls._get_read_conn() as conn:
+            cursor = conn.execute("""
                 SELECT config_value FROM project_options 
                 WHERE config_key = 'projects'
             """)
             
             row = cursor.fetchone()
-            if row:
-                try:
-                    return json.loads(row[0])
-                except (json.JSONDecodeError, TypeError) as e:
-                    logger.error(f"解析项目配置JSON失败: {str(e)}", exc_info=True)
-                    return {"projects": {}}
-            
-            return {"projects": {}}
+        
+        options = {"projects": {}}
+        if row:
+            try:
+                options = json_fast.loads(row[0])
+            except json_fast.DECODE_ERRORS as e:
+                logger.error(f"解析项目配置JSON失败: {str(e)}", exc_info=True)
+                return options
+        
+        def store():
+            cls._project_options_cache = options
+        cls._store_config_cache(version, store)
+        return options
     
     @classmethod
     def update_project_options(cls, options_data: Dict) -> bool:
         """更新项目配置"""
-        with cls._get_connection() as conn:
+        options_data = cls._normalize_project_proxy_types(options_data)
+        with cls._get_write_conn() as conn:
             cursor = conn.cursor()
             
             try:
                 timestamp = int(time.time())
-                cursor.execute("""
-                    INSERT OR REPLACE INTO project_options (config_key, config_value, updated_at)
-                    VALUES (?, ?, ?)
-                """, ("projects", json.dumps(options_data, ensure_ascii=False), timestamp))
-                conn.commit()
+                cursor.execute(_SQL_UPSERT_PROJECT_OPTIONS, ("projects", json_fast.dumps(options_data), timestamp))
+                cls._commit(conn)
                 logger.info("✅ 项目配置已更新")
-                return True
             except Exception as e:
                 logger.error(f"更新项目配置失败: {str(e)}", exc_info=True)
+                if cls._in_batch():
+                    raise
                 return False
+        
+        cls._after_commit(cls._config_written)
+        return True
 
     # ======================== 模板读写 ========================
     @classmethod
     def _ensure_default_templates(cls):
         """如果模板表缺省，则写入默认模板（幂等）"""
-        from config.constants import (
-            WORKFLOW_MESSAGE_TEMPLATE,
-            WORKFLOW_APPROVED_TEMPLATE,
-            WORKFLOW_REJECTED_TEMPLATE,
-            WORKFLOW_MESSAGE_TEMPLATE_ADDRESS,
-            WORKFLOW_APPROVED_TEMPLATE_ADDRESS,
-            WORKFLOW_REJECTED_TEMPLATE_ADDRESS,
-        )
-        with cls._get_connection() as conn:
+        with cls._get_write_conn() as conn:
             cursor = conn.cursor()
-
-            defaults = {
-                ("default", None): WORKFLOW_MESSAGE_TEMPLATE,
-                ("approved_default", None): WORKFLOW_APPROVED_TEMPLATE,
-                ("rejected_default", None): WORKFLOW_REJECTED_TEMPLATE,
-                ("address_only", None): WORKFLOW_MESSAGE_TEMPLATE_ADDRESS,
-                ("approved_address_only", None): WORKFLOW_APPROVED_TEMPLATE_ADDRESS,
-                ("rejected_address_only", None): WORKFLOW_REJECTED_TEMPLATE_ADDRESS,
-            }
-
             timestamp = int(time.time())
-            changed = False
             try:
-                for (tpl_type, project), content in defaults.items():
-                    cursor.execute(
-                        "SELECT 1 FROM message_templates WHERE template_type = ? AND project IS ?",
-                        (tpl_type, project),
+                # 一次 executemany 写入所有缺失的默认模板。project 为 NULL 时唯一约束不生效
+                # （NULL 互不相等），INSERT OR IGNORE 会重复插入，因此用 NOT EXISTS 判断是否已存在
+                cursor.executemany(
+                    """
+                    INSERT INTO message_templates (template_type, project, content, updated_at)
+                    SELECT ?, ?, ?, ?
+                    WHERE NOT EXISTS (
+                        SELECT 1 FROM message_templates WHERE template_type = ? AND project IS ?
                     )
-                    if cursor.fetchone() is None:
-                        cursor.execute(
-                            """
-                            INSERT INTO message_templates (template_type, project, content, updated_at)
-                            VALUES (?, ?, ?, ?)
-                            """,
-                            (tpl_type, project, content, timestamp),
-                        )
-                        changed = True
-                if changed:
-                    conn.commit()
+                    """,
+                    [
+                        (tpl_type, project, content, timestamp, tpl_type, project)
+                        for tpl_type, project, content in _DEFAULT_TEMPLATES
+                    ],
+                )
+                if cursor.rowcount > 0:
+                    cls._commit(conn)
             except Exception as e:
                 conn.rollback()
                 logger.error(f"初始化默认模板失败: {str(e)}", exc_info=True)
@@ -527,7 +1121,7 @@ class WorkflowManager:
     def set_message_template(cls, template_type: str, content: str, project: Optional[str] = None) -> bool:
         """写入/更新消息模板"""
         try:
-            with cls._get_connection() as conn:
+            with cls._get_write_conn() as conn:
                 cursor = conn.cursor()
                 timestamp = int(time.time())
                 cursor.execute(
@@ -540,12 +1134,19 @@ class WorkflowManager:
                     """,
                     (template_type, project, content, timestamp),
                 )
-                conn.commit()
+                cls._commit(conn)
                 return True
         except Exception as e:
             logger.error(f"更新消息模板失败: {str(e)}", exc_info=True)
+            if cls._in_batch():
+                raise
             return False
 
+    @classmethod
+    def _mark_templates_initialized(cls):
+        """标记默认模板已写入（写入提交后才设置，batch 回滚时下次仍会重新检查）"""
+        cls._templates_initialized = True
+    
     @classmethod
     def get_message_template(
         cls,
@@ -554,109 +1155,135 @@ class WorkflowManager:
         default: Optional[str] = None
     ) -> str:
         """获取消息模板，优先项目级，其次通用，最后回退默认值"""
-        # 确保有缺省模板
-        cls._ensure_default_templates()
-
-        with cls._get_connection() as conn:
-            cursor = conn.cursor()
+        # 确保有缺省模板（每个进程只检查一次）
+        if not cls._templates_initialized:
+            cls._ensure_default_templates()
+            cls._after_commit(cls._mark_templates_initialized)
 
-            # 项目级
-            if project:
-                cursor.execute(
-                    """
-                    SELECT content FROM message_templates
-                    WHERE template_type = ? AND project = ?
-                    """,
-                    (template_type, project),
-                )
-                row = cursor.fetchone()
-                if row and row[0]:
-                    return row[0]
-
-            # 全局
-            cursor.execute(
-                """
-                SELECT content FROM message_templates
-                WHERE template_type = ? AND project IS NULL
-                """,
-                (template_type,),
-            )
-            row = cursor.fetchone()
-        if row and row[0]:
+        with cls._get_read_conn() as conn:
+            row = conn.execute(_SQL_GET_MESSAGE_TEMPLATE, (template_type, project or None)).fetchone()
+        if row:
             return row[0]
 
         return default or ""
     
     @classmethod
-    def _row_to_dict(cls, row: sqlite3.Row) -> dict:
-        """将数据库行转换为字典"""
+    def _row_to_dict(cls, row: Optional[tuple]) -> Optional[dict]:
+        """
+        将数据库行（按 _WORKFLOW_COLUMNS 顺序查询的元组）转换为字典
+        
+        synced_to_api 保持数据库中的整数 0/1，按真值判断即可；template_type 默认值已由 _WORKFLOW_SELECT 补齐
+        """
         if row is None:
             return None
         
-        data = dict(row)
+        data = dict(zip(_WORKFLOW_COLUMNS, row))
         
         # 解析 group_messages JSON
-        if data.get('group_messages'):
+        group_messages = row[_WF_GROUP_MESSAGES_IDX]
+        if group_messages:
             try:
-                data['group_messages'] = json.loads(data['group_messages'])
-            except (json.JSONDecodeError, TypeError):
+                data['group_messages'] = json_fast.loads(group_messages)
+            except json_fast.DECODE_ERRORS:
                 data['group_messages'] = {}
         else:
             data['group_messages'] = {}
         
-        # 转换 synced_to_api
-        data['synced_to_api'] = bool(data.get('synced_to_api', 0))
-
-        # 补充模板类型/项目字段默认值
-        data['project'] = data.get('project')
-        data['template_type'] = data.get('template_type') or "default"
-        
         return data
     
+    @classmethod
+    def _cleanup_delete_sql(cls, conn: sqlite3.Connection) -> str:
+        """
+        返回分批删除过期工作流的 SQL（参数：截止时间修饰符、批大小）
+        
+        SQLite 编译时启用 SQLITE_ENABLE_UPDATE_DELETE_LIMIT 时直接 DELETE ... LIMIT，
+        否则回退为子查询选出一批 workflow_id 再删除。探测结果在进程内缓存。
+        """
+        if cls._delete_limit_supported is None:
+            try:
+                conn.execute("DELETE FROM workflows WHERE 0 LIMIT 1")
+                cls._delete_limit_supported = True
+            except sqlite3.OperationalError:
+                cls._delete_limit_supported = False
+        
+        if cls._delete_limit_supported:
+            return """
+                DELETE FROM workflows
+                WHERE timestamp < CAST(strftime('%s', 'now', ?) AS INTEGER)
+                LIMIT ?
+            """
+        return """
+            DELETE FROM workflows 
+            WHERE workflow_id IN (
+                SELECT workflow_id FROM workflows 
+                WHERE timestamp < CAST(strftime('%s', 'now', ?) AS INTEGER) 
+                LIMIT ?
+            )
+        """
+    
     @classmethod
     def _cleanup_old_data(cls):
         """清理 60 天前的旧数据（分批删除优化性能，避免长时间锁表）"""
+        # 分批删除需要逐批提交并执行检查点，不能并入 batch() 的单个事务
+        if cls._in_batch():
+            raise RuntimeError("不能在 WorkflowManager.batch() 中清理旧数据")
         try:
-            with cls._get_connection() as conn:
-                cursor = conn.cursor()
-                
-                # 计算 60 天前的时间戳
-                cutoff_time = datetime.now() - timedelta(days=cls.RETENTION_DAYS)
-                cutoff_timestamp = int(cutoff_time.timestamp())
-                
-                # 分批删除，每次删除1000条，避免长时间锁表
-                batch_size = 1000
-                total_deleted = 0
-                
-                while True:
-                    # 使用 LIMIT 分批删除
-                    cursor.execute("""
-                        DELETE FROM workflows 
-                        WHERE workflow_id IN (
-                            SELECT workflow_id FROM workflows 
-                            WHERE timestamp < ? 
-                            LIMIT ?
-                        )
-                    """, (cutoff_timestamp, batch_size))
-                    
+            # 截止时间由 SQLite 计算（strftime('%s', 'now', '-60 days')）
+            cutoff_modifier = f"-{cls.RETENTION_DAYS} days"
+            
+            # 分批删除，每次删除5000条；批次之间释放写锁，其他写操作可插入执行
+            batch_size = 5000
+            # 每隔多少批执行一次被动检查点，限制清理期间 WAL 文件增长
+            checkpoint_every = 10
+            total_deleted = 0
+            batches = 0
+            
+            # 先用只读连接探测最旧的一条（timestamp 索引的首项，O(1)），
+            # 没有过期数据时直接跳过删除循环，不占用写锁也不产生空的写事务
+            with cls._get_read_conn() as conn:
+                expired = conn.execute(
+                    "SELECT 1 FROM workflows WHERE timestamp < CAST(strftime('%s', 'now', ?) AS INTEGER) LIMIT 1",
+                    (cutoff_modifier,),
+                ).fetchone() is not None
+            
+            if expired:
+                with cls._get_write_conn() as conn:
+                    delete_sql = cls._cleanup_delete_sql(conn)
+            
+            while expired:
+                # 每批单独持有写连接并用 BEGIN IMMEDIATE 预占写锁，批次之间释放给其他写操作
+                with cls._get_write_conn() as conn:
+                    conn.execute("BEGIN IMMEDIATE")
+                    # 级联删除关联的消息和 SSO/Jenkins 记录
+                    cursor = conn.execute(delete_sql, (cutoff_modifier, batch_size))
                     deleted_in_batch = cursor.rowcount
-                    total_deleted += deleted_in_batch
                     conn.commit()
                     
-                    if deleted_in_batch == 0:
-                        break
-                    
-                    logger.debug(f"清理进度: 已删除 {total_deleted} 条旧数据")
-                    
-                    # 短暂休眠，让其他操作有机会执行
-                    time.sleep(0.1)
+                    batches += 1
+                    if deleted_in_batch and batches % checkpoint_every == 0:
+                        conn.execute("PRAGMA wal_checkpoint(PASSIVE)")
                 
-                if total_deleted > 0:
-                    logger.info(f"已清理 {total_deleted} 条 {cls.RETENTION_DAYS} 天前的旧数据")
-                    # 可选：执行 VACUUM 回收空间（在低峰期执行）
-                    # cursor.execute("PRAGMA incremental_vacuum")
+                total_deleted += deleted_in_batch
+                # 不足一批说明过期数据已删完，省去最后一次空删除事务
+                if deleted_in_batch < batch_size:
+                    break
                 
-                return total_deleted
+                logger.debug(f"清理进度: 已删除 {total_deleted} 条旧数据")
+            
+            if total_deleted > 0:
+                # 级联删除了消息映射，清空缓存
+                cls._message_workflow_ids.clear()
+                logger.info(f"已清理 {total_deleted} 条 {cls.RETENTION_DAYS} 天前的旧数据")
+                with cls._get_write_conn() as conn:
+                    # 截断 WAL 文件，回收批量删除产生的 WAL 增长
+                    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+                    # 回收空闲页（仅在 auto_vacuum=INCREMENTAL 时生效，否则为空操作）
+                    conn.execute("PRAGMA incremental_vacuum")
+            
+            # 刷新查询规划器统计信息（与清理任务一起周期执行）
+            cls.analyze()
+            
+            return total_deleted
         except Exception as e:
             logger.error(f"清理旧数据时发生错误: {str(e)}", exc_info=True)
             return 0
@@ -664,14 +1291,14 @@ class WorkflowManager:
     @classmethod
     def _init_app_config(cls):
         """初始化应用配置表（仅创建表结构，配置值从 settings.py 的默认值初始化）"""
-        with cls._get_connection() as conn:
+        with cls._get_write_conn() as conn:
             cursor = conn.cursor()
             
-            # 检查数据库中是否已有配置
-            cursor.execute("SELECT COUNT(*) FROM app_config")
-            count = cursor.fetchone()[0]
+            # 检查数据库中是否已有配置（读到第一行即停止，无需计数全表）
+            cursor.execute("SELECT 1 FROM app_config LIMIT 1")
+            exists = cursor.fetchone() is not None
             
-            if count > 0:
+            if exists:
                 logger.info("应用配置已存在于数据库中，跳过初始化")
                 return
         
@@ -700,7 +1327,7 @@ class WorkflowManager:
             # 2. 初始化项目配置（从 options.json）
             cls._init_project_options(options_file)
             
-            # 3. 初始化应用配置表
+            # 3. 初始化应用配置表（只读检查）
             cls._init_app_config()
             
             logger.info("✅ 工作流管理器初始化完成")
@@ -710,26 +1337,69 @@ class WorkflowManager:
     
     @classmethod
     def get_app_config(cls, key: str, default: str = None) -> Optional[str]:
-        """从数据库获取应用配置"""
-        with cls._get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT config_value FROM app_config 
-                WHERE config_key = ?
-            """, (key,))
+        """获取应用配置（进程内缓存，配置更新或超过 TTL 时失效）"""
+        cls._expire_config_cache()
+        cache = cls._app_config_cache
+        if key in cache:
+            value = cache[key]
+            return value if value is not None else default
+        
+        version = cls._cache_version
+        with cls._get_read_conn() as conn:
+            cursor = conn.execute(_SQL_GET_APP_CONFIG, (key,))
             
             row = cursor.fetchone()
-            if row and row[0] is not None:
-                return row[0]
         
-        return default
+        value = row[0] if row else None
+        cls._store_config_cache(version, lambda: cache.__setitem__(key, value))
+        return value if value is not None else default
+    
+    @classmethod
+    def get_app_config_int(cls, key: str, default: int = 0) -> int:
+        """
+        获取整型应用配置（解析结果缓存，避免每次调用都重新 int() 解析）
+        
+        Args:
+            key: 配置键
+            default: 配置缺失或非法时的默认值
+        
+        Returns:
+            解析后的整数值
+        """
+        cls._expire_config_cache()
+        cache_key = (key, default)
+        cached = cls._app_config_int_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        version = cls._cache_version
+        raw_value = cls.get_app_config(key, "")
+        try:
+            value = int(raw_value) if raw_value else default
+        except ValueError:
+            logger.warning(f"⚠️ 配置 {key} 不是合法整数: {raw_value}，使用默认值 {default}")
+            value = default
+        
+        int_cache = cls._app_config_int_cache
+        cls._store_config_cache(version, lambda: int_cache.__setitem__(cache_key, value))
+        return value
     
     @classmethod
     def get_all_app_config(cls) -> Dict[str, str]:
-        """从数据库获取所有应用配置"""
-        with cls._get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT config_key, config_value FROM app_config")
+        """
+        获取所有应用配置（按缓存版本号缓存，配置更新或超过 TTL 时失效）
+        
+        返回的字典为共享缓存，调用方不应修改
+        """
+        cls._expire_config_cache()
+        return cls._load_all_app_config(cls._cache_version)
+    
+    @classmethod
+    @functools.lru_cache(maxsize=1)
+    def _load_all_app_config(cls, version: int) -> Dict[str, str]:
+        """从数据库读取所有应用配置（version 仅作为缓存键）"""
+        with cls._get_read_conn() as conn:
+            cursor = conn.execute("SELECT config_key, config_value FROM app_config")
             rows = cursor.fetchall()
             
             config_dict = {}
@@ -741,18 +1411,20 @@ class WorkflowManager:
     @classmethod
     def update_app_config(cls, key: str, value: str) -> bool:
         """更新应用配置"""
+        if key == "PROXY_TYPE":
+            value = normalize_proxy_type(value)
         try:
-            with cls._get_connection() as conn:
+            with cls._get_write_conn() as conn:
                 cursor = conn.cursor()
                 timestamp = int(time.time())
-                cursor.execute("""
-                    INSERT OR REPLACE INTO app_config (config_key, config_value, updated_at)
-                    VALUES (?, ?, ?)
-                """, (key, value, timestamp))
-                conn.commit()
-                return True
+                cursor.execute(_SQL_UPSERT_APP_CONFIG, (key, value, timestamp))
+                cls._commit(conn)
+            cls._after_commit(cls._config_written)
+            return True
         except Exception as e:
             logger.error(f"更新应用配置失败: {str(e)}", exc_info=True)
+            if cls._in_batch():
+                raise
             return False
     
     @classmethod
@@ -773,54 +1445,41 @@ class WorkflowManager:
             submission_data: 提交的数据（字符串格式）
             
         Returns:
-            创建的工作流数据字典
+            数据库中存储的工作流数据字典（与 get_workflow 格式一致）
         """
         # 生成工作流ID
         workflow_id = generate_workflow_id()
         timestamp = int(time.time())
-        created_at = get_current_timestamp()
+        created_at = get_current_timestamp(timestamp)
         
         # 插入工作流（使用事务确保原子性）
         try:
-            with cls._get_connection() as conn:
+            with cls._get_write_conn() as conn:
                 cursor = conn.cursor()
-                cursor.execute("""
-                    INSERT INTO workflows (
-                        workflow_id, timestamp, user_id, username, submission_data,
-                        status, created_at, project, template_type
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """, (workflow_id, timestamp, user_id, username, submission_data, STATUS_PENDING, created_at, project, template_type))
+                cursor.row_factory = None  # 元组行，由 _row_to_dict 按位置转换
+                params = (workflow_id, timestamp, user_id, username, submission_data, STATUS_PENDING, created_at, project, template_type)
+                if _RETURNING_SUPPORTED:
+                    row = cursor.execute(_SQL_INSERT_WORKFLOW_RETURNING, params).fetchone()
+                else:
+                    # 旧版本 SQLite：在同一事务内按主键读回
+                    cursor.execute(_SQL_INSERT_WORKFLOW, params)
+                    row = cursor.execute(_SQL_GET_WORKFLOW, (workflow_id,)).fetchone()
                 
-                conn.commit()
+                cls._commit(conn)
                 logger.info(f"✅ 工作流已创建 - ID: {workflow_id}, 用户: {username} ({user_id})")
         except Exception as e:
             logger.error(f"创建工作流失败: {str(e)}", exc_info=True)
             raise
         
-        # 返回创建的工作流数据
-        return {
-            "workflow_id": workflow_id,
-            "timestamp": timestamp,
-            "user_id": user_id,
-            "username": username,
-            "submission_data": submission_data,
-            "status": STATUS_PENDING,
-            "created_at": created_at,
-            "synced_to_api": False,
-            "group_messages": {},
-            "project": project,
-            "template_type": template_type,
-        }
+        return cls._row_to_dict(row)
     
     @classmethod
     def get_workflow(cls, workflow_id: str) -> Optional[dict]:
         """获取工作流"""
-        with cls._get_connection() as conn:
+        with cls._get_read_conn() as conn:
             cursor = conn.cursor()
-            cursor.execute("""
-                SELECT * FROM workflows 
-                WHERE workflow_id = ?
-            """, (workflow_id,))
+            cursor.row_factory = None  # 元组行，由 _row_to_dict 按位置转换
+            cursor.execute(_SQL_GET_WORKFLOW, (workflow_id,))
             
             row = cursor.fetchone()
             if row:
@@ -829,21 +1488,31 @@ class WorkflowManager:
         return None
     
     @classmethod
-    def get_workflow_by_message_id(cls, message_id: int) -> Optional[dict]:
-        """根据消息ID获取工作流"""
-        with cls._get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT w.* FROM workflows w
-                INNER JOIN workflow_messages wm ON w.workflow_id = wm.workflow_id
-                WHERE wm.message_id = ?
-            """, (message_id,))
-            
-            row = cursor.fetchone()
-            if row:
-                return cls._row_to_dict(row)
+    def get_workflow_by_message_id(cls, group_id: int, message_id: int) -> Optional[dict]:
+        """
+        根据群组消息获取工作流（Telegram 消息ID只在会话内唯一，需同时提供群组ID）
         
-        return None
+        (群组ID, 消息ID) -> 工作流ID 走进程内缓存，再按主键读取工作流
+        """
+        key = (group_id, message_id)
+        workflow_id = cls._message_workflow_ids.get(key)
+        if workflow_id is None:
+            with cls._get_read_conn() as conn:
+                row = conn.execute(_SQL_GET_WORKFLOW_ID_BY_MESSAGE_ID, key).fetchone()
+            if row is None:
+                return None
+            workflow_id = row[0]
+            cls._remember_message_workflows(((key, workflow_id),))
+        
+        return cls.get_workflow(workflow_id)
+    
+    @classmethod
+    def _remember_message_workflows(cls, mappings: Iterable[Tuple[Tuple[int, int], str]]):
+        """写入 (群组ID, 消息ID) -> 工作流ID 缓存（超过上限时整体清空，避免无限增长）"""
+        cache = cls._message_workflow_ids
+        if len(cache) >= cls.MESSAGE_CACHE_MAX_SIZE:
+            cache.clear()
+        cache.update(mappings)
     
     @classmethod
     def update_workflow(cls, workflow_id: str, **kwargs) -> bool:
@@ -852,74 +1521,151 @@ class WorkflowManager:
         
         Args:
             workflow_id: 工作流ID
-            **kwargs: 要更新的字段
+            **kwargs: 要更新的字段（synced_to_api 按真值写入整数 0/1）
         
         Returns:
             是否成功
         """
-        # 构建更新字段
-        update_fields = []
-        values = []
-        
         # 处理特殊字段
-        group_messages_dict = None
-        if 'group_messages' in kwargs:
-            group_messages_dict = kwargs['group_messages']
-            kwargs['group_messages'] = json.dumps(group_messages_dict, ensure_ascii=False) if group_messages_dict else None
-        
         if 'synced_to_api' in kwargs:
             kwargs['synced_to_api'] = 1 if kwargs['synced_to_api'] else 0
         
-        # 构建 SQL 更新语句
-        allowed_fields = [
-            'user_id', 'username', 'submission_data', 'status',
-            'approver_id', 'approver_username', 'approval_time',
-            'approval_comment', 'synced_to_api', 'group_messages',
-            'project', 'template_type'
-        ]
-        
-        for field, value in kwargs.items():
-            if field in allowed_fields:
-                update_fields.append(f"{field} = ?")
-                values.append(value)
+        if 'group_messages' in kwargs:
+            group_messages = kwargs['group_messages']
+            kwargs['group_messages'] = json_fast.dumps(group_messages) if group_messages else None
         
+        # 构建更新字段（白名单交集按字段名排序，同一字段组合与传参顺序无关，命中 SQL 构建缓存和语句缓存）
+        update_fields = tuple(sorted(_WORKFLOW_UPDATE_FIELDS.intersection(kwargs)))
         if not update_fields:
             logger.warning(f"没有有效的更新字段 - 工作流ID: {workflow_id}")
             return False
         
         # 执行更新
+        values = [kwargs[field] for field in update_fields]
         values.append(workflow_id)
-        sql = f"""
-            UPDATE workflows 
-            SET {', '.join(update_fields)}
-            WHERE workflow_id = ?
-        """
+        sql = _build_update_sql("workflows", "workflow_id", update_fields)
         
         try:
-            with cls._get_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute(sql, values)
-                conn.commit()
+            with cls._get_write_conn() as conn:
+                cursor = conn.execute(sql, values)
+                cls._commit(conn)
                 logger.debug(f"工作流已更新 - ID: {workflow_id}, 更新字段: {list(kwargs.keys())}")
                 return True
         except Exception as e:
             logger.error(f"更新工作流失败 - 工作流ID: {workflow_id}, 错误: {str(e)}", exc_info=True)
+            if cls._in_batch():
+                raise
+            return False
+    
+    @classmethod
+    def transition_status(cls, workflow_id: str, from_status: str, to_status: str, **kwargs) -> bool:
+        """
+        条件更新工作流状态（仅当当前状态为 from_status 时更新，单条 UPDATE 原子完成检查与写入）
+        
+        Args:
+            workflow_id: 工作流ID
+            from_status: 要求的当前状态
+            to_status: 目标状态
+            **kwargs: 同时更新的其他字段（如审批人、审批时间）
+        
+        Returns:
+            是否发生了状态转换（工作流不存在或状态不符时返回 False）
+        """
+        if 'synced_to_api' in kwargs:
+            kwargs['synced_to_api'] = 1 if kwargs['synced_to_api'] else 0
+        
+        # status 由 from_status/to_status 决定；group_messages 需要序列化，走 update_workflow
+        update_fields = tuple(sorted(
+            _WORKFLOW_UPDATE_FIELDS.intersection(kwargs).difference(('status', 'group_messages'))
+        ))
+        values = [to_status, *(kwargs[field] for field in update_fields), workflow_id, from_status]
+        sql = _build_transition_sql(update_fields)
+        
+        try:
+            with cls._get_write_conn() as conn:
+                cursor = conn.execute(sql, values)
+                if cursor.rowcount == 0:
+                    logger.debug(f"工作流状态未转换（不存在或当前状态不是 {from_status}）- ID: {workflow_id}")
+                    return False
+                cls._commit(conn)
+                logger.debug(f"工作流状态已转换 - ID: {workflow_id}, {from_status} -> {to_status}")
+                return True
+        except Exception as e:
+            logger.error(f"转换工作流状态失败 - 工作流ID: {workflow_id}, 错误: {str(e)}", exc_info=True)
+            if cls._in_batch():
+                raise
+            return False
+    
+    @classmethod
+    def record_workflow_messages(cls, workflow_id: str, pairs: Iterable[Tuple[int, int]]) -> bool:
+        """
+        记录工作流发送到各群组的消息ID（消息映射表 + group_messages 字段在同一事务中写入，
+        group_messages 与已有内容在 SQL 中合并）
+        
+        Args:
+            workflow_id: 工作流ID
+            pairs: (group_id, message_id) 序列
+        
+        Returns:
+            是否成功
+        """
+        group_messages = dict(pairs)
+        if not group_messages:
+            return False
+        
+        try:
+            with cls._get_write_conn() as conn:
+                conn.executemany(
+                    _SQL_UPSERT_WORKFLOW_MESSAGE,
+                    [(group_id, message_id, workflow_id) for group_id, message_id in group_messages.items()],
+                )
+                conn.execute(_SQL_MERGE_GROUP_MESSAGES, (json_fast.dumps(group_messages), workflow_id))
+                cls._commit(conn)
+                cls._remember_message_workflows(
+                    ((group_id, message_id), workflow_id) for group_id, message_id in group_messages.items()
+                )
+                logger.debug(f"工作流群组消息已记录 - ID: {workflow_id}, 群组数: {len(group_messages)}")
+                return True
+        except Exception as e:
+            logger.error(f"记录工作流群组消息失败 - 工作流ID: {workflow_id}, 错误: {str(e)}", exc_info=True)
+            if cls._in_batch():
+                raise
             return False
     
     @classmethod
     def delete_workflow(cls, workflow_id: str) -> bool:
         """删除工作流（级联删除关联的消息和 SSO 记录）"""
         try:
-            with cls._get_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute("DELETE FROM workflows WHERE workflow_id = ?", (workflow_id,))
-                conn.commit()
+            with cls._get_write_conn() as conn:
+                cursor = conn.execute("DELETE FROM workflows WHERE workflow_id = ?", (workflow_id,))
+                cls._commit(conn)
+                # 级联删除了消息映射，清空缓存
+                cls._message_workflow_ids.clear()
                 logger.info(f"✅ 工作流已删除 - ID: {workflow_id}")
                 return True
         except Exception as e:
             logger.error(f"删除工作流失败 - 工作流ID: {workflow_id}, 错误: {str(e)}", exc_info=True)
+            if cls._in_batch():
+                raise
             return False
     
+    @staticmethod
+    def _workflow_filter(status: Optional[str], project: Optional[str]) -> tuple:
+        """构建工作流查询的 WHERE 子句和参数"""
+        conditions = []
+        params = []
+        
+        if status:
+            conditions.append("status = ?")
+            params.append(status)
+        
+        if project:
+            conditions.append("project = ?")
+            params.append(project)
+        
+        where_clause = "WHERE " + " AND ".join(conditions) if conditions else ""
+        return where_clause, params
+    
     @classmethod
     def get_all_workflows(
         cls, 
@@ -940,23 +1686,11 @@ class WorkflowManager:
         Returns:
             工作流字典
         """
-        # 构建查询条件
-        conditions = []
-        params = []
-        
-        if status:
-            conditions.append("status = ?")
-            params.append(status)
-        
-        if project:
-            conditions.append("project = ?")
-            params.append(project)
-        
-        where_clause = "WHERE " + " AND ".join(conditions) if conditions else ""
+        where_clause, params = cls._workflow_filter(status, project)
         
         # 构建SQL（使用索引优化的ORDER BY）
         sql = f"""
-            SELECT * FROM workflows 
+            SELECT {_WORKFLOW_SELECT} FROM workflows 
             {where_clause}
             ORDER BY timestamp DESC
         """
@@ -965,17 +1699,59 @@ class WorkflowManager:
             sql += " LIMIT ? OFFSET ?"
             params.extend([limit, offset])
         
-        with cls._get_connection() as conn:
+        with cls._get_read_conn() as conn:
             cursor = conn.cursor()
-            cursor.execute(sql, params)
-            rows = cursor.fetchall()
-            
-            workflows = {}
-            for row in rows:
-                data = cls._row_to_dict(row)
-                workflows[data['workflow_id']] = data
-            
-            return workflows
+            cursor.row_factory = None  # 元组行，由 _rows_to_workflow_dicts 按位置转换
+            # 直接迭代游标逐行读取，不先 fetchall() 物化整个结果集
+            return _rows_to_workflow_dicts(cursor.execute(sql, params))
+    
+    @classmethod
+    def get_daily_workflow_counts(
+        cls,
+        start_time: int,
+        end_time: int,
+        status: Optional[str] = None,
+    ) -> Dict[int, int]:
+        """
+        按天统计工作流数量（SQLite 3.31+ 走 idx_workflows_day 索引，无需逐行转换时间）
+        
+        Args:
+            start_time: 起始时间戳（秒，包含）
+            end_time: 结束时间戳（秒，包含）
+            status: 按状态过滤（可选）
+        
+        Returns:
+            {UTC 天序号（timestamp // 86400）: 工作流数量}
+        """
+        sql = f"""
+            SELECT {_DAY_BUCKET_EXPR}, COUNT(*) FROM workflows
+            WHERE {_DAY_BUCKET_EXPR} BETWEEN ? AND ?
+        """
+        params = [start_time // 86400, end_time // 86400]
+        if status:
+            sql += " AND status = ?"
+            params.append(status)
+        sql += f" GROUP BY {_DAY_BUCKET_EXPR}"
+        
+        with cls._get_read_conn() as conn:
+            return {row[0]: row[1] for row in conn.execute(sql, params)}
+    
+    @classmethod
+    def analyze(cls):
+        """
+        收集索引统计信息（ANALYZE，写入 sqlite_stat1）
+        
+        数据分布倾斜时（如绝大多数工作流为 approved）规划器依赖统计信息选择正确的索引；
+        analysis_limit 限制每个索引的采样行数，避免大表上长时间持有写锁。
+        """
+        try:
+            with cls._get_write_conn() as conn:
+                conn.execute("PRAGMA analysis_limit = 1000")
+                conn.execute("ANALYZE")
+                cls._commit(conn)
+            logger.debug("数据库统计信息已更新（ANALYZE）")
+        except Exception as e:
+            logger.error(f"更新数据库统计信息失败: {str(e)}", exc_info=True)
     
     @classmethod
     def cleanup_old_data(cls) -> int:
@@ -1005,13 +1781,12 @@ class WorkflowManager:
         # 生成提交ID（使用 workflow_id 作为 submission_id）
         submission_id = workflow_id
         submit_time = int(time.time())
-        created_at = get_current_timestamp()
+        created_at = get_current_timestamp(submit_time)
         updated_at = created_at
         
         try:
-            with cls._get_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute("""
+            with cls._get_write_conn() as conn:
+                cursor = conn.execute("""
                     INSERT INTO sso_submissions (
                         submission_id, workflow_id, process_instance_id,
                         sso_order_data, submit_status, submit_time,
@@ -1021,14 +1796,14 @@ class WorkflowManager:
                     submission_id,
                     workflow_id,
                     process_instance_id,
-                    json.dumps(sso_order_data, ensure_ascii=False),
+                    json_fast.dumps(sso_order_data),
                     'pending',
                     submit_time,
                     created_at,
                     updated_at
                 ))
                 
-                conn.commit()
+                cls._commit(conn)
                 logger.info(f"✅ SSO 提交记录已创建 - Submission ID: {submission_id}, 工作流ID: {workflow_id}")
                 
                 return {
@@ -1056,10 +1831,9 @@ class WorkflowManager:
         Returns:
             SSO 提交记录字典，如果不存在返回 None
         """
-        with cls._get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT * FROM sso_submissions 
+        with cls._get_read_conn() as conn:
+            cursor = conn.execute(f"""
+                SELECT {_SSO_SUBMISSION_SELECT} FROM sso_submissions
                 WHERE workflow_id = ?
                 ORDER BY submit_time DESC
                 LIMIT 1
@@ -1071,13 +1845,13 @@ class WorkflowManager:
                 # 解析 JSON 字段
                 if data.get('sso_order_data'):
                     try:
-                        data['sso_order_data'] = json.loads(data['sso_order_data'])
-                    except (json.JSONDecodeError, TypeError):
+                        data['sso_order_data'] = json_fast.loads(data['sso_order_data'])
+                    except json_fast.DECODE_ERRORS:
                         pass
                 if data.get('submit_response'):
                     try:
-                        data['submit_response'] = json.loads(data['submit_response'])
-                    except (json.JSONDecodeError, TypeError):
+                        data['submit_response'] = json_fast.loads(data['submit_response'])
+                    except json_fast.DECODE_ERRORS:
                         pass
                 return data
         
@@ -1100,30 +1874,18 @@ class WorkflowManager:
             response: SSO 提交响应（可选）
             error: 错误信息（可选）
         """
-        updated_at = get_current_timestamp()
-        update_fields = ["submit_status = ?", "updated_at = ?"]
-        values = [status, updated_at]
-        
-        if response:
-            update_fields.append("submit_response = ?")
-            values.append(json.dumps(response, ensure_ascii=False))
-        
-        if error:
-            update_fields.append("error_message = ?")
-            values.append(error)
-        
-        values.append(submission_id)
+        submit_response = json_fast.dumps(response) if response else None
         
         try:
-            with cls._get_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute(f"""
-                    UPDATE sso_submissions 
-                    SET {', '.join(update_fields)}
-                    WHERE submission_id = ?
-                """, values)
-                
-                conn.commit()
+            with cls._get_write_conn() as conn:
+                conn.execute(_SQL_UPDATE_SSO_SUBMISSION_STATUS, (
+                    status,
+                    get_current_timestamp(),
+                    submit_response,
+                    error or None,
+                    submission_id,
+                ))
+                cls._commit(conn)
                 logger.info(f"✅ SSO 提交状态已更新 - Submission ID: {submission_id}, 状态: {status}")
         except Exception as e:
             logger.error(f"更新 SSO 提交状态失败: {e}", exc_info=True)
@@ -1156,21 +1918,14 @@ class WorkflowManager:
             构建状态记录字典
         """
         # 生成构建ID
-        build_id = f"BUILD-{int(time.time())}-{str(uuid.uuid4())[:8].upper()}"
         build_start_time = int(time.time())
-        created_at = get_current_timestamp()
+        build_id = f"BUILD-{build_start_time}-{secrets.token_hex(4).upper()}"
+        created_at = get_current_timestamp(build_start_time)
         updated_at = created_at
         
         try:
-            with cls._get_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute("""
-                    INSERT INTO sso_build_status (
-                        build_id, submission_id, workflow_id, release_id,
-                        job_name, service_name, job_id, build_status,
-                        build_start_time, created_at, updated_at
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
+            with cls._get_write_conn() as conn:
+                cursor = conn.execute(_SQL_INSERT_SSO_BUILD_STATUS, (
                     build_id,
                     submission_id,
                     workflow_id,
@@ -1184,7 +1939,7 @@ class WorkflowManager:
                     updated_at
                 ))
                 
-                conn.commit()
+                cls._commit(conn)
                 logger.info(f"✅ 构建状态记录已创建 - Build ID: {build_id}, Release ID: {release_id}, Job: {job_name}")
                 
                 return {
@@ -1209,7 +1964,7 @@ class WorkflowManager:
         cls,
         build_id: str,
         status: str,
-        build_detail: Optional[Dict] = None
+        build_detail: Optional[Union[Dict, str, bytes]] = None
     ):
         """
         更新构建状态
@@ -1217,84 +1972,75 @@ class WorkflowManager:
         Args:
             build_id: 构建ID
             status: 构建状态 (BUILDING/SUCCESS/FAILURE/ABORTED)
-            build_detail: 构建详情（可选）
+            build_detail: 构建详情（可选，字典或已序列化的 JSON 字符串/字节，
+                jobName 由 SQLite json_extract 提取，无需在 Python 中解析）
         """
-        updated_at = get_current_timestamp()
-        update_fields = ["build_status = ?", "updated_at = ?"]
-        values = [status, updated_at]
-        
-        # 如果构建完成，记录结束时间
-        if status in ['SUCCESS', 'FAILURE', 'ABORTED']:
-            update_fields.append("build_end_time = ?")
-            values.append(int(time.time()))
-        
-        if build_detail:
-            update_fields.append("build_detail = ?")
-            values.append(json.dumps(build_detail, ensure_ascii=False))
-            
-            # 从构建详情中提取 job_name
-            if 'jobName' in build_detail:
-                update_fields.append("job_name = ?")
-                values.append(build_detail['jobName'])
-        
-        values.append(build_id)
+        finished = status in ['SUCCESS', 'FAILURE', 'ABORTED']
+        finished_at = int(time.time())
         
         try:
-            with cls._get_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute(f"""
-                    UPDATE sso_build_status 
-                    SET {', '.join(update_fields)}
-                    WHERE build_id = ?
-                """, values)
+            if isinstance(build_detail, bytes):
+                build_detail = build_detail.decode("utf-8")
+            elif build_detail and not isinstance(build_detail, str):
+                build_detail = json_fast.dumps(build_detail)
+            
+            with cls._get_write_conn() as conn:
+                cursor = conn.execute(_SQL_UPDATE_SSO_BUILD_STATUS, {
+                    "build_id": build_id,
+                    "status": status,
+                    "updated_at": get_current_timestamp(finished_at),
+                    "end_time": finished_at,
+                    "build_detail": build_detail or None,
+                })
                 
-                conn.commit()
+                # 构建完成且尚未通知时入队（同一事务内，与状态更新原子提交）
+                if finished:
+                    cursor.execute("""
+                        INSERT OR IGNORE INTO sso_notification_queue (build_id, enqueued_at)
+                        SELECT build_id, ? FROM sso_build_status
+                        WHERE build_id = ? AND notified = 0
+                    """, (finished_at, build_id))
+                else:
+                    # 状态回到未完成时出队，避免被当作待通知构建读取
+                    cursor.execute("DELETE FROM sso_notification_queue WHERE build_id = ?", (build_id,))
+                
+                cls._commit(conn)
                 logger.debug(f"构建状态已更新 - Build ID: {build_id}, 状态: {status}")
         except Exception as e:
             logger.error(f"更新构建状态失败: {e}", exc_info=True)
             raise
     
     @classmethod
-    def get_pending_notifications(cls, limit: Optional[int] = 100) -> List[Dict]:
+    def get_pending_notifications(cls, limit: Optional[int] = 100, parse_detail: bool = True) -> List[BuildRow]:
         """
         获取待通知的构建状态（构建完成但未通知，优化查询性能）
         
         Args:
             limit: 限制返回数量（默认100，避免一次返回过多数据）
+            parse_detail: 是否将 build_detail 解析为字典（False 时保留原始 JSON 字符串，
+                由真正需要字典的调用方自行解析）
         
         Returns:
-            构建状态记录列表
+            构建状态记录列表（BuildRow，支持 row["field"] 读取）
         """
-        # 使用索引优化的查询（build_status, notified, build_end_time 复合索引）
-        sql = """
-            SELECT * FROM sso_build_status 
-            WHERE build_status IN ('SUCCESS', 'FAILURE', 'ABORTED')
-            AND notified = 0
-            ORDER BY build_end_time ASC
+        # 从通知队列按入队顺序读取（队列只包含待通知构建，无需扫描历史记录）
+        sql = f"""
+            SELECT {", ".join(f"b.{column}" for column in _SSO_BUILD_COLUMNS)}
+            FROM sso_notification_queue q
+            INNER JOIN sso_build_status b ON b.build_id = q.build_id
+            WHERE b.build_status IN ('SUCCESS', 'FAILURE', 'ABORTED')
+            ORDER BY q.enqueued_at ASC
         """
+        params = []
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
         
-        with cls._get_connection() as conn:
+        with cls._get_read_conn() as conn:
             cursor = conn.cursor()
-            if limit:
-                sql += " LIMIT ?"
-                cursor.execute(sql, (limit,))
-            else:
-                cursor.execute(sql)
-            
-            rows = cursor.fetchall()
-            results = []
-            
-            for row in rows:
-                data = dict(row)
-                # 解析 JSON 字段
-                if data.get('build_detail'):
-                    try:
-                        data['build_detail'] = json.loads(data['build_detail'])
-                    except (json.JSONDecodeError, TypeError):
-                        pass
-                results.append(data)
-            
-            return results
+            cursor.row_factory = None  # 元组行，按位置构造 BuildRow
+            rows = cursor.execute(sql, params).fetchall()
+        return _decode_build_rows(rows, parse_detail)
     
     @classmethod
     def mark_build_notified(cls, build_id: str):
@@ -1304,20 +2050,33 @@ class WorkflowManager:
         Args:
             build_id: 构建ID
         """
+        cls.mark_builds_notified([build_id])
+    
+    @classmethod
+    def mark_builds_notified(cls, build_ids: List[str]):
+        """
+        批量标记构建已通知（json_each 展开ID列表，单条语句更新，一次提交）
+        
+        需要与其他写入合并提交时在 batch() 中调用。
+        
+        Args:
+            build_ids: 构建ID列表
+        """
+        if not build_ids:
+            return
+        
+        # 只取一次时间，整数时间戳与格式化时间保持一致
         notification_time = int(time.time())
-        updated_at = get_current_timestamp()
+        updated_at = get_current_timestamp(notification_time)
         
         try:
-            with cls._get_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute("""
-                    UPDATE sso_build_status 
-                    SET notified = 1, notification_time = ?, updated_at = ?
-                    WHERE build_id = ?
-                """, (notification_time, updated_at, build_id))
-                
-                conn.commit()
-                logger.debug(f"构建已标记为已通知 - Build ID: {build_id}")
+            with cls._get_write_conn() as conn:
+                ids_json = json_fast.dumps(list(build_ids))
+                # 写连接隐式以 BEGIN IMMEDIATE 开启事务，更新与出队在同一事务中提交
+                conn.execute(_MARK_NOTIFIED_SQL, (notification_time, updated_at, ids_json))
+                conn.execute(_DEQUEUE_NOTIFICATION_SQL, (ids_json,))
+                cls._commit(conn)
+                logger.debug(f"构建已标记为已通知 - 数量: {len(build_ids)}")
         except Exception as e:
             logger.error(f"标记构建已通知失败: {e}", exc_info=True)
             raise
@@ -1349,15 +2108,14 @@ class WorkflowManager:
             Jenkins 构建记录字典
         """
         # 生成构建ID
-        build_id = f"JENKINS-{int(time.time())}-{str(uuid.uuid4())[:8].upper()}"
         build_start_time = int(time.time())
-        created_at = get_current_timestamp()
+        build_id = f"JENKINS-{build_start_time}-{secrets.token_hex(4).upper()}"
+        created_at = get_current_timestamp(build_start_time)
         updated_at = created_at
         
         try:
-            with cls._get_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute("""
+            with cls._get_write_conn() as conn:
+                cursor = conn.execute("""
                     INSERT INTO jenkins_builds (
                         build_id, workflow_id, job_name, job_url, build_number,
                         build_status, build_start_time, build_parameters,
@@ -1371,12 +2129,12 @@ class WorkflowManager:
                     build_number,
                     build_status,
                     build_start_time,
-                    json.dumps(build_parameters, ensure_ascii=False) if build_parameters else None,
+                    json_fast.dumps(build_parameters) if build_parameters else None,
                     created_at,
                     updated_at
                 ))
                 
-                conn.commit()
+                cls._commit(conn)
                 logger.info(f"✅ Jenkins 构建记录已创建 - Build ID: {build_id}, Job: {job_name}, Build: {build_number}")
                 
                 return {
@@ -1407,46 +2165,30 @@ class WorkflowManager:
         Returns:
             是否成功
         """
-        updated_at = get_current_timestamp()
-        update_fields = ["updated_at = ?"]
-        values = [updated_at]
-        
         # 处理特殊字段
         if 'build_parameters' in kwargs and kwargs['build_parameters']:
-            kwargs['build_parameters'] = json.dumps(kwargs['build_parameters'], ensure_ascii=False)
-        
-        # 构建 SQL 更新语句
-        allowed_fields = [
-            'job_name', 'job_url', 'build_number', 'build_status',
-            'build_start_time', 'build_end_time', 'build_duration',
-            'build_console_output', 'build_parameters', 'build_result'
-        ]
+            kwargs['build_parameters'] = json_fast.dumps(kwargs['build_parameters'])
         
-        for field, value in kwargs.items():
-            if field in allowed_fields:
-                update_fields.append(f"{field} = ?")
-                values.append(value)
-        
-        if len(update_fields) == 1:  # 只有 updated_at
+        # 构建更新字段（白名单交集按字段名排序，同一字段组合与传参顺序无关，命中 SQL 构建缓存和语句缓存）
+        update_fields = tuple(sorted(_JENKINS_BUILD_UPDATE_FIELDS.intersection(kwargs)))
+        if not update_fields:
             logger.warning(f"没有有效的更新字段 - Build ID: {build_id}")
             return False
         
-        values.append(build_id)
+        values = [get_current_timestamp(), *(kwargs[field] for field in update_fields), build_id]
+        sql = _build_update_sql("jenkins_builds", "build_id", ("updated_at", *update_fields))
         
         try:
-            with cls._get_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute(f"""
-                    UPDATE jenkins_builds 
-                    SET {', '.join(update_fields)}
-                    WHERE build_id = ?
-                """, values)
+            with cls._get_write_conn() as conn:
+                cursor = conn.execute(sql, values)
                 
-                conn.commit()
+                cls._commit(conn)
                 logger.debug(f"Jenkins 构建记录已更新 - Build ID: {build_id}, 更新字段: {list(kwargs.keys())}")
                 return True
         except Exception as e:
             logger.error(f"更新 Jenkins 构建记录失败 - Build ID: {build_id}, 错误: {str(e)}", exc_info=True)
+            if cls._in_batch():
+                raise
             return False
     
     @classmethod
@@ -1460,10 +2202,9 @@ class WorkflowManager:
         Returns:
             Jenkins 构建记录字典，如果不存在返回 None
         """
-        with cls._get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT * FROM jenkins_builds 
+        with cls._get_read_conn() as conn:
+            cursor = conn.execute(f"""
+                SELECT {_JENKINS_BUILD_SELECT} FROM jenkins_builds
                 WHERE workflow_id = ?
                 ORDER BY created_at DESC
                 LIMIT 1
@@ -1475,8 +2216,8 @@ class WorkflowManager:
                 # 解析 JSON 字段
                 if data.get('build_parameters'):
                     try:
-                        data['build_parameters'] = json.loads(data['build_parameters'])
-                    except (json.JSONDecodeError, TypeError):
+                        data['build_parameters'] = json_fast.loads(data['build_parameters'])
+                    except json_fast.DECODE_ERRORS:
                         pass
                 return data
         
@@ -1493,10 +2234,9 @@ class WorkflowManager:
         Returns:
             Jenkins 构建记录字典，如果不存在返回 None
         """
-        with cls._get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT * FROM jenkins_builds 
+        with cls._get_read_conn() as conn:
+            cursor = conn.execute(f"""
+                SELECT {_JENKINS_BUILD_SELECT} FROM jenkins_builds
                 WHERE build_id = ?
             """, (build_id,))
             
@@ -1506,8 +2246,8 @@ class WorkflowManager:
                 # 解析 JSON 字段
                 if data.get('build_parameters'):
                     try:
-                        data['build_parameters'] = json.loads(data['build_parameters'])
-                    except (json.JSONDecodeError, TypeError):
+                        data['build_parameters'] = json_fast.loads(data['build_parameters'])
+                    except json_fast.DECODE_ERRORS:
                         pass
                 return data
         
@@ -1526,10 +2266,9 @@ class WorkflowManager:
         Returns:
             Jenkins 构建记录字典，如果不存在返回 None
         """
-        with cls._get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT * FROM jenkins_builds 
+        with cls._get_read_conn() as conn:
+            cursor = conn.execute(f"""
+                SELECT {_JENKINS_BUILD_SELECT} FROM jenkins_builds
                 WHERE workflow_id = ? AND job_name = ? AND build_number = ?
                 LIMIT 1
             """, (workflow_id, job_name, build_number))
@@ -1540,34 +2279,39 @@ class WorkflowManager:
                 # 解析 JSON 字段
                 if data.get('build_parameters'):
                     try:
-                        data['build_parameters'] = json.loads(data['build_parameters'])
-                    except (json.JSONDecodeError, TypeError):
+                        data['build_parameters'] = json_fast.loads(data['build_parameters'])
+                    except json_fast.DECODE_ERRORS:
                         pass
                 return data
         
         return None
     
     @classmethod
-    def get_pending_jenkins_notifications(cls, limit: Optional[int] = 100) -> List[Dict]:
+    def get_pending_jenkins_notifications(
+        cls, limit: Optional[int] = 100, parse_parameters: bool = True
+    ) -> List[Dict]:
         """
         获取待通知的 Jenkins 构建（构建完成但未通知，优化查询性能）
         
         Args:
             limit: 限制返回数量（默认100，避免一次返回过多数据）
+            parse_parameters: 是否将 build_parameters 解析为字典（False 时保留原始 JSON 字符串，
+                只需要构建ID/状态等字段的调用方不承担解析开销）
         
         Returns:
-            Jenkins 构建记录列表
+            Jenkins 构建记录列表（不含 build_console_output，需要时用 get_jenkins_build_by_id 读取）
         """
         # 使用索引优化的查询（build_status, notified, build_end_time 复合索引）
-        sql = """
-            SELECT * FROM jenkins_builds 
+        sql = f"""
+            SELECT {_JENKINS_PENDING_SELECT} FROM jenkins_builds
             WHERE build_status IN ('SUCCESS', 'FAILURE', 'ABORTED', 'UNSTABLE')
             AND notified = 0
             ORDER BY build_end_time ASC
         """
         
-        with cls._get_connection() as conn:
+        with cls._get_read_conn() as conn:
             cursor = conn.cursor()
+            cursor.row_factory = None  # 元组行，按位置访问，每行只构造一次结果字典
             if limit:
                 sql += " LIMIT ?"
                 cursor.execute(sql, (limit,))
@@ -1575,15 +2319,22 @@ class WorkflowManager:
                 cursor.execute(sql)
             
             rows = cursor.fetchall()
-            results = []
             
+            # 列名与 build_parameters 的位置只解析一次
+            columns = [desc[0] for desc in cursor.description]
+            if not parse_parameters:
+                return [dict(zip(columns, row)) for row in rows]
+            
+            results = []
+            params_idx = columns.index('build_parameters')
             for row in rows:
-                data = dict(row)
+                data = dict(zip(columns, row))
                 # 解析 JSON 字段
-                if data.get('build_parameters'):
+                build_parameters = row[params_idx]
+                if build_parameters:
                     try:
-                        data['build_parameters'] = json.loads(data['build_parameters'])
-                    except (json.JSONDecodeError, TypeError):
+                        data['build_parameters'] = json_fast.loads(build_parameters)
+                    except json_fast.DECODE_ERRORS:
                         pass
                 results.append(data)
             
@@ -1600,21 +2351,37 @@ class WorkflowManager:
         Returns:
             是否成功
         """
+        return cls.mark_jenkins_builds_notified([build_id])
+    
+    @classmethod
+    def mark_jenkins_builds_notified(cls, build_ids: List[str]) -> bool:
+        """
+        批量标记 Jenkins 构建已通知（json_each 展开ID列表，单条语句更新，一次提交）
+        
+        Args:
+            build_ids: 构建ID列表
+        
+        Returns:
+            是否成功
+        """
+        if not build_ids:
+            return True
+        
+        # 只取一次时间，整数时间戳与格式化时间保持一致
         notification_time = int(time.time())
-        updated_at = get_current_timestamp()
+        updated_at = get_current_timestamp(notification_time)
         
         try:
-            with cls._get_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute("""
-                    UPDATE jenkins_builds 
-                    SET notified = 1, notification_time = ?, updated_at = ?
-                    WHERE build_id = ?
-                """, (notification_time, updated_at, build_id))
-                
-                conn.commit()
-                logger.debug(f"Jenkins 构建已标记为已通知 - Build ID: {build_id}")
+            with cls._get_write_conn() as conn:
+                conn.execute(
+                    _MARK_JENKINS_NOTIFIED_SQL,
+                    (notification_time, updated_at, json_fast.dumps(list(build_ids))),
+                )
+                cls._commit(conn)
+                logger.debug(f"Jenkins 构建已标记为已通知 - 数量: {len(build_ids)}")
                 return True
         except Exception as e:
             logger.error(f"标记 Jenkins 构建已通知失败: {e}", exc_info=True)
+            if cls._in_batch():
+                raise
             return False
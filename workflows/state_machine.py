@@ -16,23 +16,16 @@ class WorkflowStateMachine:
         approval_comment: Optional[str] = None,
     ) -> bool:
         """审批通过工作流"""
-        workflow = WorkflowManager.get_workflow(workflow_id)
-        if not workflow:
-            return False
-        
-        if workflow["status"] != STATUS_PENDING:
-            return False  # 只能审批待审批状态的工作流
-        
-        WorkflowManager.update_workflow(
+        # 只能审批待审批状态的工作流（状态检查与更新在同一条 UPDATE 中完成）
+        return WorkflowManager.transition_status(
             workflow_id,
-            status=STATUS_APPROVED,
+            STATUS_PENDING,
+            STATUS_APPROVED,
             approver_id=approver_id,
             approver_username=approver_username,
             approval_time=get_current_timestamp(),
             approval_comment=approval_comment or "已通过",
         )
-        
-        return True
     
     @staticmethod
     def reject_workflow(
@@ -42,26 +35,19 @@ class WorkflowStateMachine:
         approval_comment: Optional[str] = None,
     ) -> bool:
         """拒绝工作流"""
-        workflow = WorkflowManager.get_workflow(workflow_id)
-        if not workflow:
-            return False
-        
-        if workflow["status"] != STATUS_PENDING:
-            return False  # 只能审批待审批状态的工作流
-        
-        WorkflowManager.update_workflow(
+        # 只能审批待审批状态的工作流（状态检查与更新在同一条 UPDATE 中完成）
+        return WorkflowManager.transition_status(
             workflow_id,
-            status=STATUS_REJECTED,
+            STATUS_PENDING,
+            STATUS_REJECTED,
             approver_id=approver_id,
             approver_username=approver_username,
             approval_time=get_current_timestamp(),
             approval_comment=approval_comment or "已拒绝",
         )
-        
-        return True
     
     @staticmethod
     def mark_as_synced(workflow_id: str) -> bool:
         """标记工作流已同步到API"""
-        return WorkflowManager.update_workflow(workflow_id, synced_to_api=True)
+        return WorkflowManager.update_workflow(workflow_id, synced_to_api=1)
 
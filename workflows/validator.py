@@ -12,10 +12,8 @@ def validate_submission_data(data: str) -> Tuple[bool, Optional[str]]:
     Returns:
         (是否有效, 错误信息)
     """
-    if not data:
-        return False, "提交内容不能为空"
-    
-    if len(data.strip()) == 0:
+    # isspace() 遇到第一个非空白字符即返回，不像 strip() 那样复制整个字符串
+    if not data or data.isspace():
         return False, "提交内容不能为空"
     
     # 可以添加更多验证规则